@@ -0,0 +1,220 @@
+import asyncio
+import bisect
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.backend import db
+from app.backend.businesses import LOOKUP_CHUNK_SIZE
+from app.backend.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# How many of the most recent ratings make up a trend
+SCORE_TREND_WINDOW = int(os.getenv("SCORE_TREND_WINDOW", "5"))
+
+# Tables folded into the per-business scores, by score name
+SCORE_TABLES = {
+    "hygiene": "hygiene_ratings",
+    "inspections": "inspections",
+    "reviews": "reviews",
+}
+
+
+def _date_key(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value or "")
+
+
+class RatingStats:
+    """Running count, average, histogram and recent trend of one rating series."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram: Dict[int, int] = {}
+        self.recent: List[tuple] = []  # (date, rating), oldest first, at most SCORE_TREND_WINDOW
+
+    def add(self, rating: int, date: Any) -> None:
+        self.count += 1
+        self.total += rating
+        self.histogram[rating] = self.histogram.get(rating, 0) + 1
+        bisect.insort(self.recent, (_date_key(date), rating))
+        if len(self.recent) > SCORE_TREND_WINDOW:
+            del self.recent[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        trend = [rating for _, rating in self.recent]
+        return {
+            "latest": trend[-1] if trend else None,
+            "latest_date": self.recent[-1][0] if self.recent else None,
+            "count": self.count,
+            "average": round(self.total / self.count, 2) if self.count else None,
+            "histogram": {str(rating): n for rating, n in sorted(self.histogram.items())},
+            "trend": trend,
+            "trend_delta": trend[-1] - trend[0] if len(trend) > 1 else 0,
+        }
+
+
+# business_id -> {score name -> RatingStats}
+_scores: Dict[int, Dict[str, RatingStats]] = {}
+
+# Businesses whose scores are being loaded (with the number of loaders), and
+# those written to mid-load
+_loading: Dict[int, int] = {}
+_dirty: Set[int] = set()
+
+# True once rebuild_all has loaded every business, so a business missing from
+# _scores has no ratings yet rather than not being loaded
+_complete = False
+
+# Rows recorded while rebuild_all scans, replayed into the rebuilt scores
+# unless the scan already read them
+_rebuild_writes: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+
+# Concurrent rebuild requests share one run
+_rebuild_flight = SingleFlight("aggregates_rebuild", enabled=True)
+
+
+def _empty_scores() -> Dict[str, RatingStats]:
+    return {name: RatingStats() for name in SCORE_TABLES}
+
+
+def _fold(scores: Dict[str, RatingStats], name: str, row: Dict[str, Any]) -> None:
+    if row.get("rating") is not None:
+        scores[name].add(int(row["rating"]), row.get("date"))
+
+
+def record(table_name: str, row: Dict[str, Any]) -> None:
+    """Folds a newly inserted hygiene rating, inspection or review into the scores."""
+    business_id = row.get("business_id")
+    if _rebuild_writes is not None:
+        _rebuild_writes.append((table_name, row))
+    if business_id in _loading:
+        _dirty.add(business_id)
+    scores = _scores.get(business_id)
+    if scores is None:
+        if not _complete:
+            # Not loaded yet; the first read will pick this row up from the table
+            return
+        scores = _scores[business_id] = _empty_scores()
+    for name, score_table in SCORE_TABLES.items():
+        if score_table == table_name:
+            _fold(scores, name, row)
+
+
+async def _load_many(business_ids: List[int]) -> Dict[int, Dict[str, RatingStats]]:
+    """Loads several businesses' scores with one paged scan per score table and chunk of ids.
+
+    Ids are sent LOOKUP_CHUNK_SIZE at a time, like businesses.lookup_many, to
+    keep the filter (and so the request URL) short.
+    """
+    loaded = {business_id: _empty_scores() for business_id in business_ids}
+    chunks = [business_ids[i:i + LOOKUP_CHUNK_SIZE] for i in range(0, len(business_ids), LOOKUP_CHUNK_SIZE)]
+
+    async def load_table(name: str, table_name: str, chunk: List[int]):
+        async for rows in db.iter_rows(
+            table_name, "id,business_id,rating,date", filters=lambda query: query.in_("business_id", chunk)
+        ):
+            for row in rows:
+                _fold(loaded[row["business_id"]], name, row)
+
+    for business_id in business_ids:
+        _loading[business_id] = _loading.get(business_id, 0) + 1
+    try:
+        await asyncio.gather(*(
+            load_table(name, table_name, chunk) for name, table_name in SCORE_TABLES.items() for chunk in chunks
+        ))
+    finally:
+        for business_id in business_ids:
+            _loading[business_id] -= 1
+            if not _loading[business_id]:
+                del _loading[business_id]
+    # A write that landed mid-load may or may not be in what we read, so only
+    # keep a result if nothing was written to that business meanwhile.
+    for business_id, scores in loaded.items():
+        if business_id not in _dirty:
+            _scores[business_id] = scores
+        elif business_id not in _loading:
+            _dirty.discard(business_id)
+    return loaded
+
+
+async def _load(business_id: int) -> Dict[str, RatingStats]:
+    return (await _load_many([business_id]))[business_id]
+
+
+def is_complete() -> bool:
+    """Whether every business's scores are in memory (after rebuild_all)."""
+    return _complete
+
+
+async def get_scores(business_id: int) -> Dict[str, Any]:
+    """Returns a business's hygiene, inspection and review aggregates."""
+    scores = _scores.get(business_id)
+    if scores is None:
+        scores = await _load(business_id)
+    return {"business_id": business_id, **{name: stats.to_dict() for name, stats in scores.items()}}
+
+
+async def latest_ratings(business_ids: List[int], name: str = "hygiene") -> Dict[int, Optional[int]]:
+    """The most recent rating of one score for many businesses, loading any not in memory.
+
+    Businesses not in memory are loaded together, so the cost is one scan per
+    score table rather than per business; callers should still bound the list.
+    """
+    missing = [] if _complete else list({business_id for business_id in business_ids if business_id not in _scores})
+    loaded = await _load_many(missing) if missing else {}
+    latest = {}
+    for business_id in business_ids:
+        scores = _scores.get(business_id) or loaded.get(business_id)
+        recent = scores[name].recent if scores else None
+        latest[business_id] = recent[-1][1] if recent else None
+    return latest
+
+
+async def _rebuild(chunk_size: int) -> Dict[str, int]:
+    global _complete, _rebuild_writes
+    rebuilt: Dict[int, Dict[str, RatingStats]] = {}
+    counts = {}
+    last_ids: Dict[str, Any] = {}
+    _rebuild_writes = []
+    try:
+        for name, table_name in SCORE_TABLES.items():
+            counts[table_name] = 0
+            async for rows in db.iter_rows(table_name, "id,business_id,rating,date", chunk_size=chunk_size):
+                for row in rows:
+                    scores = rebuilt.get(row["business_id"])
+                    if scores is None:
+                        scores = rebuilt[row["business_id"]] = _empty_scores()
+                    _fold(scores, name, row)
+                counts[table_name] += len(rows)
+                last_ids[table_name] = rows[-1]["id"]
+
+        # The scans read in id order, so a row written meanwhile was read
+        # only if its id is within what its table's scan covered
+        names = {table_name: name for name, table_name in SCORE_TABLES.items()}
+        for table_name, row in _rebuild_writes:
+            last_id = last_ids.get(table_name)
+            if table_name in names and (last_id is None or row.get("id") is None or row["id"] > last_id):
+                scores = rebuilt.get(row["business_id"])
+                if scores is None:
+                    scores = rebuilt[row["business_id"]] = _empty_scores()
+                _fold(scores, names[table_name], row)
+
+        _scores.clear()
+        _scores.update(rebuilt)
+        _complete = True
+    finally:
+        _rebuild_writes = None
+    logger.info(f"Rebuilt score aggregates for {len(rebuilt)} businesses from {counts}")
+    return {"businesses": len(rebuilt), **counts}
+
+
+async def rebuild_all(chunk_size: int = 5000) -> Dict[str, int]:
+    """Recomputes every business's aggregates from the tables in bulk.
+
+    Rows recorded while the tables are scanned are folded in before the
+    rebuilt scores replace the current ones, so none are lost.
+    """
+    return await _rebuild_flight.do("rebuild", lambda: _rebuild(chunk_size))
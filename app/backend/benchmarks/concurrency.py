@@ -0,0 +1,61 @@
+"""Compares request throughput with blocking vs. thread-pool Supabase calls.
+
+Each simulated request runs one query that blocks for `--latency` seconds, the
+way a synchronous supabase-py call does. Run with:
+
+    python -m app.backend.benchmarks.concurrency --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+from app.backend import db
+
+
+class SlowQuery:
+    """Stand-in for a query builder whose execute() blocks on network I/O."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def execute(self):
+        time.sleep(self.latency)
+        return []
+
+
+async def blocking_handler(latency: float):
+    # What the routes used to do: call execute() directly on the event loop.
+    return SlowQuery(latency).execute()
+
+
+async def offloaded_handler(latency: float):
+    return await db.execute(SlowQuery(latency))
+
+
+async def drive(handler, requests: int, concurrency: int, latency: float) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int, latency: float):
+    print(f"{requests} requests, concurrency {concurrency}, {latency * 1000:.0f}ms per query, "
+          f"{db.SUPABASE_MAX_WORKERS} pool threads")
+    for label, handler in (("blocking", blocking_handler), ("thread pool", offloaded_handler)):
+        rps = await drive(handler, requests, concurrency, latency)
+        print(f"{label:>12}: {rps:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency))
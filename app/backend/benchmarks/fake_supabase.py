@@ -0,0 +1,305 @@
+"""In-process stand-in for the parts of the Supabase client the backend uses.
+
+Tables live in memory, storage objects in a dict and auth accepts any token.
+Every call sleeps for a configurable latency (plus jitter) on the calling
+thread, the way the blocking supabase-py client waits on the network, so the
+app's thread pool, caches and concurrency limits behave as they would against
+the hosted project.
+"""
+import random
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# Default simulated round-trip time per kind of call, in seconds
+DEFAULT_LATENCY = {"query": 0.01, "storage": 0.03, "auth": 0.02}
+
+
+class _Latency:
+    def __init__(self, latency: Optional[Dict[str, float]], jitter: float):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.jitter = jitter
+
+    def wait(self, kind: str) -> None:
+        base = self.latency.get(kind, 0)
+        if base > 0:
+            time.sleep(base * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+def _comparable(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    if left is None:
+        return op == "is" and right in (None, "null")
+    left, right = _comparable(left), _comparable(right)
+    if type(left) is not type(right):
+        left, right = str(left), str(right)
+    return {
+        "eq": left == right,
+        "neq": left != right,
+        "gt": left > right,
+        "gte": left >= right,
+        "lt": left < right,
+        "lte": left <= right,
+    }[op]
+
+
+def _split_top_level(text: str) -> List[str]:
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    parts.append(current)
+    return parts
+
+
+def _parse_logic(expression: str, conjunction: str = "or"):
+    """Parses a PostgREST or=/and= filter into a predicate over a row."""
+    predicates = []
+    for part in _split_top_level(expression):
+        for nested in ("and", "or"):
+            if part.startswith(f"{nested}(") and part.endswith(")"):
+                predicates.append(_parse_logic(part[len(nested) + 1:-1], nested))
+                break
+        else:
+            column, op, value = part.split(".", 2)
+            value = value[1:-1] if value.startswith('"') and value.endswith('"') else value
+            predicates.append(lambda row, c=column, o=op, v=value: _compare(o, row.get(c), v))
+    combine = any if conjunction == "or" else all
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeSupabase", table_name: str):
+        self.client = client
+        self.path = f"/{table_name}"
+        self.table_name = table_name
+        self.action = "select"
+        self.columns: Optional[List[str]] = None
+        self.payload: Any = None
+        self.filters: List = []
+        self.ordering: List = []
+        self.row_limit: Optional[int] = None
+
+    # Query building
+    def select(self, columns: str = "*", **kwargs) -> "FakeQuery":
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, rows, **kwargs) -> "FakeQuery":
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, **kwargs) -> "FakeQuery":
+        self.action, self.payload = "upsert", rows
+        return self
+
+    def update(self, values: Dict[str, Any], **kwargs) -> "FakeQuery":
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self, **kwargs) -> "FakeQuery":
+        self.action = "delete"
+        return self
+
+    def _filter(self, op: str, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: _compare(op, row.get(column), value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def neq(self, column, value):
+        return self._filter("neq", column, value)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def in_(self, column, values):
+        wanted = {_comparable(v) for v in values}
+        self.filters.append(lambda row: _comparable(row.get(column)) in wanted)
+        return self
+
+    def or_(self, expression: str, **kwargs):
+        self.filters.append(_parse_logic(expression))
+        return self
+
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count: int, **kwargs):
+        self.row_limit = count
+        return self
+
+    # Execution
+    def execute(self):
+        self.client.latency.wait("query")
+        with self.client.lock:
+            return SimpleNamespace(data=getattr(self, f"_{self.action}")(), count=None)
+
+    def _rows(self) -> List[Dict[str, Any]]:
+        return self.client.tables.setdefault(self.table_name, [])
+
+    def _matching(self) -> List[Dict[str, Any]]:
+        return [row for row in self._rows() if all(f(row) for f in self.filters)]
+
+    def _select(self):
+        rows = self._matching()
+        for column, desc in reversed(self.ordering):
+            rows.sort(key=lambda row: (row.get(column) is None, _comparable(row.get(column))), reverse=desc)
+        if self.row_limit is not None:
+            rows = rows[:self.row_limit]
+        if self.columns:
+            rows = [{c: row.get(c) for c in self.columns} for row in rows]
+        return [dict(row) for row in rows]
+
+    def _insert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = []
+        for row in rows:
+            row = dict(row)
+            if row.get("id") is None:
+                row["id"] = self.client.next_id(self.table_name)
+            row.setdefault("created_at", datetime.utcnow().isoformat())
+            self._rows().append(row)
+            inserted.append(dict(row))
+        return inserted
+
+    def _upsert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        by_id = {row["id"]: row for row in self._rows()}
+        for row in rows:
+            if row.get("id") in by_id:
+                by_id[row["id"]].update(row)
+        self.payload = [row for row in rows if row.get("id") not in by_id]
+        return [dict(row) for row in rows if row.get("id") in by_id] + self._insert()
+
+    def _update(self):
+        updated = []
+        for row in self._matching():
+            row.update({k: v for k, v in self.payload.items() if not (k == "id" and v is None)})
+            updated.append(dict(row))
+        return updated
+
+    def _delete(self):
+        doomed = self._matching()
+        doomed_ids = {id(row) for row in doomed}
+        self.client.tables[self.table_name] = [row for row in self._rows() if id(row) not in doomed_ids]
+        return [dict(row) for row in doomed]
+
+
+class FakeBucket:
+    def __init__(self, client: "FakeSupabase", name: str):
+        self.client = client
+        self.name = name
+
+    def upload(self, path: str, file: Any, file_options: Optional[Dict] = None):
+        self.client.latency.wait("storage")
+        data = file if isinstance(file, bytes) else file.read()
+        with self.client.lock:
+            if (self.name, path) in self.client.objects:
+                raise Exception("The resource already exists")
+            self.client.objects[(self.name, path)] = data
+        return SimpleNamespace(path=path)
+
+    def list(self, path: Optional[str] = None, options: Optional[Dict] = None):
+        self.client.latency.wait("storage")
+        prefix = f"{path.rstrip('/')}/" if path else ""
+        search = (options or {}).get("search", "")
+        names = [
+            object_path[len(prefix):]
+            for bucket, object_path in list(self.client.objects)
+            if bucket == self.name and object_path.startswith(prefix) and "/" not in object_path[len(prefix):]
+        ]
+        return [{"name": name} for name in names if search in name]
+
+    def remove(self, paths: List[str]):
+        self.client.latency.wait("storage")
+        with self.client.lock:
+            for path in paths:
+                self.client.objects.pop((self.name, path), None)
+        return []
+
+    def get_public_url(self, path: str) -> str:
+        return f"https://storage.local/{self.name}/{path}"
+
+
+class FakeStorage:
+    def __init__(self, client: "FakeSupabase"):
+        self.client = client
+
+    def from_(self, name: str) -> FakeBucket:
+        return FakeBucket(self.client, name)
+
+
+class FakeAuth:
+    def __init__(self, client: "FakeSupabase"):
+        self.client = client
+
+    def get_user(self, token: str):
+        self.client.latency.wait("auth")
+        return SimpleNamespace(user=SimpleNamespace(
+            id="00000000-0000-0000-0000-000000000001",
+            phone="+910000000000",
+            user_metadata={"name": "Benchmark User", "user_type": "business_owner"},
+        ))
+
+
+class FakeSupabase:
+    """Drop-in for supabase.Client: assign an instance to app.backend.db.supabase and db.auth_client."""
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None, jitter: float = 0.2):
+        self.latency = _Latency(latency, jitter)
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.objects: Dict[tuple, bytes] = {}
+        self.lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self.storage = FakeStorage(self)
+        self.auth = FakeAuth(self)
+
+    def next_id(self, table_name: str) -> int:
+        self._ids[table_name] = self._ids.get(table_name, 0) + 1
+        return self._ids[table_name]
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def seed(self, table_name: str, rows: List[Dict[str, Any]]) -> None:
+        """Loads rows directly, without simulated latency."""
+        for row in rows:
+            row = dict(row)
+            if row.get("id") is None:
+                row["id"] = self.next_id(table_name)
+            else:
+                self._ids[table_name] = max(self._ids.get(table_name, 0), row["id"])
+            self.tables.setdefault(table_name, []).append(row)
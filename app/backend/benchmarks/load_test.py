@@ -0,0 +1,221 @@
+"""Offline load test of the FastAPI app against the in-process Supabase fake.
+
+Seeds the fake with businesses and their records, then drives a weighted mix
+of routes through the ASGI app at a fixed concurrency and reports latency
+percentiles and throughput per route. Run with:
+
+    python -m app.backend.benchmarks.load_test --requests 2000 --concurrency 50
+    python -m app.backend.benchmarks.load_test --mix profile=1 --query-latency 0.05
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+# Tokens are signed with this secret and verified locally by auth.py
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret")
+# Queued onboarding requests are spooled here instead of the working directory
+os.environ.setdefault("ONBOARDING_SPOOL_DIR", tempfile.mkdtemp(prefix="onboarding-bench-"))
+
+import httpx
+
+from app.backend import db
+from app.backend.benchmarks.fake_supabase import FakeSupabase
+from app.backend.main import app
+
+# Scenario name -> default weight in the request mix
+DEFAULT_MIX = {
+    "business": 4,
+    "business_by_license": 3,
+    "profile": 3,
+    "reviews": 2,
+    "create_review": 1,
+    "onboard": 0.2,
+}
+
+# 1x1 PNG used for onboarding uploads
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+
+def make_token(secret: str, user_id: str = "00000000-0000-0000-0000-000000000001") -> str:
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+
+    header = encode({"alg": "HS256", "typ": "JWT"})
+    payload = encode({
+        "sub": user_id,
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+        "phone": "+910000000000",
+        "user_metadata": {"name": "Benchmark User", "user_type": "business_owner"},
+    })
+    signature = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    return f"{header}.{payload}.{base64.urlsafe_b64encode(signature).decode().rstrip('=')}"
+
+
+def seed(fake: FakeSupabase, businesses: int, records: int) -> None:
+    now = datetime.utcnow()
+    fake.seed("businesses", [
+        {
+            "id": i, "name": f"Business {i}", "address": f"{i} Market Road", "phone": "+910000000000",
+            "email": f"owner{i}@example.com", "license_number": f"LIC{i:06d}", "business_type": "restaurant",
+            "owner_id": "00000000-0000-0000-0000-000000000001", "owner_name": f"Owner {i}",
+            "owner_photo_url": "", "logo_url": "", "trade_license": "TL", "gst_number": "GST",
+            "fire_safety_cert": "FSC",
+        }
+        for i in range(1, businesses + 1)
+    ])
+    for table_name, row in (
+        ("inspections", lambda b, d: {"business_id": b, "inspector_id": 1, "date": d, "rating": random.randint(1, 5), "comments": "ok"}),
+        ("hygiene_ratings", lambda b, d: {"business_id": b, "rating": random.randint(1, 5), "date": d}),
+        ("reviews", lambda b, d: {"business_id": b, "reviewer_id": 1, "rating": random.randint(1, 5), "comment": "fine", "date": d}),
+        ("lab_reports", lambda b, d: {"business_id": b, "report_type": "water", "date": d, "result": "pass", "file_url": None}),
+    ):
+        fake.seed(table_name, [
+            row(b, (now - timedelta(days=n)).isoformat())
+            for b in range(1, businesses + 1)
+            for n in range(records)
+        ])
+
+
+def scenarios(token: str, businesses: int) -> Dict[str, Callable[[httpx.AsyncClient], "asyncio.Future"]]:
+    params = {"token": token}
+
+    def business_id() -> int:
+        return random.randint(1, businesses)
+
+    async def onboard(client: httpx.AsyncClient):
+        license_number = f"NEW{random.randrange(10 ** 9):09d}"
+        files = [
+            ("business_logo", ("logo.png", PNG, "image/png")),
+            ("owner_photo", ("owner.png", PNG, "image/png")),
+            ("team_member_photos", ("a.png", PNG, "image/png")),
+            ("team_member_photos", ("b.png", PNG, "image/png")),
+        ] + [("facility_photos", (f"f{i}.png", PNG, "image/png")) for i in range(5)]
+        data = {
+            "business_name": "Load Test Cafe", "address": "1 Test Street", "phone": "+910000000000",
+            "email": "cafe@example.com", "license_number": license_number, "business_type": "restaurant",
+            "owner_name": "Owner", "trade_license": "TL", "gst_number": "GST", "fire_safety_cert": "FSC",
+            "team_member_names": "A,B", "team_member_roles": "Chef,Server",
+            "facility_photo_area_names": ",".join(f"Area {i}" for i in range(5)),
+        }
+        return await client.post("/business/onboard", params=params, data=data, files=files)
+
+    return {
+        "business": lambda client: client.get(f"/business/{business_id()}", params=params),
+        "business_by_license": lambda client: client.get(f"/business/license/LIC{business_id():06d}", params=params),
+        "profile": lambda client: client.get(f"/business/{business_id()}/profile", params=params),
+        "reviews": lambda client: client.get(f"/reviews/{business_id()}", params={**params, "limit": 50}),
+        "create_review": lambda client: client.post("/review", params=params, json={
+            "id": None, "business_id": business_id(), "reviewer_id": 1, "rating": random.randint(1, 5),
+            "comment": "Load test review", "date": datetime.utcnow().isoformat(),
+        }),
+        "onboard": onboard,
+    }
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(requests: int, concurrency: int, mix: Dict[str, float], token: str, businesses: int) -> Tuple[Dict, float]:
+    available = scenarios(token, businesses)
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    remaining = requests
+
+    # ASGITransport doesn't send lifespan events, so the app's startup (index
+    # loads, onboarding workers) and shutdown are run explicitly
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                name = random.choices(names, weights)[0]
+                start = time.perf_counter()
+                response = await available[name](client)
+                latencies[name].append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors[name] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {name: (latencies[name], errors[name]) for name in names}, elapsed
+
+
+def report(results: Dict, elapsed: float) -> None:
+    print(f"{'route':<22}{'count':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'mean ms':>9}")
+    total = 0
+    for name, (samples, errors) in results.items():
+        if not samples:
+            continue
+        total += len(samples)
+        print(
+            f"{name:<22}{len(samples):>7}{errors:>8}{len(samples) / elapsed:>9.1f}"
+            f"{percentile(samples, 50) * 1000:>9.1f}{percentile(samples, 95) * 1000:>9.1f}"
+            f"{percentile(samples, 99) * 1000:>9.1f}{statistics.mean(samples) * 1000:>9.1f}"
+        )
+    print(f"{'total':<22}{total:>7}{'':>8}{total / elapsed:>9.1f}  in {elapsed:.2f}s")
+
+
+def parse_mix(values: List[str]) -> Dict[str, float]:
+    if not values:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for value in values:
+        name, _, weight = value.partition("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--businesses", type=int, default=200)
+    parser.add_argument("--records", type=int, default=20, help="inspections, ratings, reviews and lab reports per business")
+    parser.add_argument("--query-latency", type=float, default=0.01)
+    parser.add_argument("--storage-latency", type=float, default=0.03)
+    parser.add_argument("--auth-latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--mix", nargs="*", metavar="SCENARIO=WEIGHT", help=f"scenarios: {', '.join(DEFAULT_MIX)}")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    fake = FakeSupabase(
+        latency={"query": args.query_latency, "storage": args.storage_latency, "auth": args.auth_latency},
+        jitter=args.jitter,
+    )
+    seed(fake, args.businesses, args.records)
+    db.supabase = db.auth_client = fake
+
+    token = make_token(os.environ["SUPABASE_JWT_SECRET"])
+    print(f"{args.requests} requests at concurrency {args.concurrency} against {args.businesses} businesses; "
+          f"latency query={args.query_latency}s storage={args.storage_latency}s auth={args.auth_latency}s")
+    results, elapsed = asyncio.run(run(args.requests, args.concurrency, parse_mix(args.mix), token, args.businesses))
+    report(results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
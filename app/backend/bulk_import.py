@@ -0,0 +1,189 @@
+import codecs
+import csv
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type, get_args, get_type_hints
+
+from pydantic import BaseModel, ValidationError
+
+from app.backend import db
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+
+# Per-row errors kept in the report; later errors are only counted
+MAX_REPORTED_ERRORS = int(os.getenv("MAX_REPORTED_ERRORS", "1000"))
+
+
+# Longest line (or quoted CSV record) accepted, in characters
+MAX_IMPORT_LINE_LENGTH = int(os.getenv("MAX_IMPORT_LINE_LENGTH", str(1024 * 1024)))
+
+
+class StreamError(Exception):
+    """The body can't be read any further; rows before it are still imported."""
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Splits a streamed UTF-8 body into lines without buffering the whole body.
+
+    Raises StreamError on invalid UTF-8 or a line longer than MAX_IMPORT_LINE_LENGTH.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    # Pieces of the current unfinished line, so each chunk is only split once
+    pending: List[str] = []
+    pending_length = 0
+
+    def decode(chunk: bytes, final: bool = False) -> str:
+        try:
+            return decoder.decode(chunk, final=final)
+        except UnicodeDecodeError as e:
+            raise StreamError(f"Invalid UTF-8: {e.reason}")
+
+    async for chunk in stream:
+        *lines, rest = decode(chunk).split("\n")
+        if lines:
+            pending.append(lines[0])
+            lines[0] = "".join(pending)
+            pending, pending_length = [], 0
+        for line in lines:
+            if len(line) > MAX_IMPORT_LINE_LENGTH:
+                raise StreamError(f"Line longer than {MAX_IMPORT_LINE_LENGTH} characters")
+            yield line + "\n"
+        pending.append(rest)
+        pending_length += len(rest)
+        if pending_length > MAX_IMPORT_LINE_LENGTH:
+            raise StreamError(f"Line longer than {MAX_IMPORT_LINE_LENGTH} characters")
+    pending.append(decode(b"", final=True))
+    last = "".join(pending)
+    if last:
+        yield last
+
+
+async def iter_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yields (line number, parsed object or exception) for each non-blank line."""
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+async def iter_csv(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yields (row number, dict or exception) for each CSV record after the header.
+
+    Lines are joined only while a quoted field is open, so records spanning
+    several lines parse correctly without buffering more than one record.
+    """
+    header = None
+    row_number = 0
+    record = ""
+    quoted = False
+    async for line in lines:
+        record += line
+        if len(record) > MAX_IMPORT_LINE_LENGTH:
+            raise StreamError(f"Record longer than {MAX_IMPORT_LINE_LENGTH} characters")
+        quoted ^= line.count('"') % 2 == 1
+        if quoted:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text.rstrip("\r\n")]))
+        except csv.Error as e:
+            values = e
+        if header is None:
+            if isinstance(values, Exception):
+                raise ValueError(f"Invalid CSV header: {values}")
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if isinstance(values, Exception):
+            yield row_number, values
+            continue
+        # Empty cells are null, so Optional columns can be left blank
+        yield row_number, {name: (value if value != "" else None) for name, value in zip(header, values)}
+    if record.strip():
+        yield row_number + 1, ValueError("Unterminated quoted field")
+
+
+def _nullable_defaults(model: Type[BaseModel]) -> Dict[str, None]:
+    # Optional columns may be left out of a row entirely
+    hints = get_type_hints(model)
+    return {name: None for name in model.__fields__ if type(None) in get_args(hints.get(name))}
+
+
+async def import_rows(
+    table_name: str,
+    model: Type[BaseModel],
+    rows: AsyncIterator[Tuple[int, Any]],
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    on_inserted: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+) -> Dict[str, Any]:
+    """Validates streamed rows against `model` and bulk-inserts them chunk by chunk.
+
+    Invalid rows and failed chunks are reported per row without stopping the
+    import, and only one chunk is held in memory at a time. A body that can't
+    be read further (StreamError) is reported as one failed row and sets
+    `stopped`. `on_inserted` is
+    called with each chunk of rows the database accepted.
+    """
+    report: Dict[str, Any] = {"received": 0, "inserted": 0, "failed": 0, "stopped": False, "errors": []}
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    defaults = _nullable_defaults(model)
+
+    def fail(row_number: int, error: str) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": error})
+
+    async def flush() -> None:
+        try:
+            result = await db.execute(db.table(table_name).insert([data for _, data in chunk]))
+        except Exception as e:
+            logger.error(f"Bulk insert into {table_name} failed for rows {chunk[0][0]}-{chunk[-1][0]}: {str(e)}")
+            for row_number, _ in chunk:
+                fail(row_number, f"Insert failed: {str(e)}")
+        else:
+            inserted = result.data or []
+            report["inserted"] += len(inserted)
+            if on_inserted is not None and inserted:
+                on_inserted(inserted)
+        chunk.clear()
+
+    row_number = 0
+    try:
+        async for row_number, data in rows:
+            report["received"] += 1
+            if isinstance(data, Exception):
+                fail(row_number, f"Unparseable row: {str(data)}")
+                continue
+            if not isinstance(data, dict):
+                fail(row_number, "Row must be an object")
+                continue
+            try:
+                record = model(**{**defaults, **data})
+            except ValidationError as e:
+                fail(row_number, str(e))
+                continue
+            # Round-trip through JSON so dates are sent as ISO strings
+            chunk.append((row_number, json.loads(record.json(exclude={"id"}))))
+            if len(chunk) >= chunk_size:
+                await flush()
+    except StreamError as e:
+        # The rest of the body is unreadable; keep what was parsed so far
+        logger.warning(f"Bulk import into {table_name} stopped after row {row_number}: {str(e)}")
+        report["received"] += 1
+        fail(row_number + 1, str(e))
+        report["stopped"] = True
+    if chunk:
+        await flush()
+
+    report["truncated_errors"] = report["failed"] > len(report["errors"])
+    return report
@@ -0,0 +1,120 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Set
+
+from app.backend import db
+from app.backend.cache import TTLCache
+from app.backend.singleflight import SingleFlight
+
+# Read-through cache of business rows, keyed by ("id", id) and ("license", number)
+_cache = TTLCache(
+    maxsize=int(os.getenv("BUSINESS_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("BUSINESS_CACHE_TTL", "60")),
+)
+
+# Maximum number of values per in_() filter, to keep request URLs reasonable
+LOOKUP_CHUNK_SIZE = int(os.getenv("BUSINESS_LOOKUP_CHUNK_SIZE", "200"))
+
+# Bumped on every invalidation so a read that raced with a write doesn't put
+# the row it fetched before the write back into the cache.
+_generation = 0
+
+# Concurrent cache misses for the same business share one query
+_flights = SingleFlight("businesses")
+
+# License numbers each business id has been cached under, so invalidating an
+# id also drops its license entries even when the id entry is gone or the
+# license has since changed
+_licenses: Dict[int, Set[str]] = {}
+
+
+def remember(business: Dict[str, Any]) -> None:
+    """Caches a business row under its id and license number."""
+    _cache.set(("id", business["id"]), business)
+    if business.get("license_number"):
+        _cache.set(("license", business["license_number"]), business)
+        _licenses.setdefault(business["id"], set()).add(business["license_number"])
+        if len(_licenses) > 2 * _cache.maxsize:
+            # Forget ids whose license entries have all been evicted or expired
+            for business_id in [business_id for business_id, numbers in _licenses.items()
+                                if not any(("license", number) in _cache for number in numbers)]:
+                del _licenses[business_id]
+
+
+def invalidate(business_id: Optional[int] = None, license_number: Optional[str] = None) -> None:
+    """Drops a business from the cache by id and/or license number."""
+    global _generation
+    _generation += 1
+    if license_number:
+        cached = _cache.pop(("license", license_number))
+        if cached and business_id is None:
+            business_id = cached["id"]
+    if business_id is not None:
+        _cache.pop(("id", business_id))
+        for number in _licenses.pop(business_id, ()):
+            _cache.pop(("license", number))
+
+
+async def _read_through(key: tuple, column: str, value: Any) -> Optional[Dict[str, Any]]:
+    business = _cache.get(key)
+    if business is not None:
+        return business
+    flight_key = (key, _generation, db.write_generation("businesses"))
+    return await _flights.do(flight_key, lambda: _fetch(column, value))
+
+
+async def _fetch(column: str, value: Any) -> Optional[Dict[str, Any]]:
+    generation = _generation
+    result = await db.execute(db.table("businesses").select("*").eq(column, value))
+    if not result.data:
+        return None
+    business = result.data[0]
+    if generation == _generation:
+        remember(business)
+    return business
+
+
+async def get_by_id(business_id: int) -> Optional[Dict[str, Any]]:
+    return await _read_through(("id", business_id), "id", business_id)
+
+
+async def get_by_license(license_number: str) -> Optional[Dict[str, Any]]:
+    return await _read_through(("license", license_number), "license_number", license_number)
+
+
+async def _fetch_many(column: str, values: List[Any]) -> List[Dict[str, Any]]:
+    generation = _generation
+    chunks = [values[i:i + LOOKUP_CHUNK_SIZE] for i in range(0, len(values), LOOKUP_CHUNK_SIZE)]
+    results = await asyncio.gather(
+        *(db.execute(db.table("businesses").select("*").in_(column, chunk)) for chunk in chunks)
+    )
+    rows = [row for result in results for row in (result.data or [])]
+    if generation == _generation:
+        for row in rows:
+            remember(row)
+    return rows
+
+
+async def lookup_many(ids: List[int], license_numbers: List[str]) -> Dict[str, Dict[Any, Optional[Dict[str, Any]]]]:
+    """Resolves many ids and license numbers, querying only the ones not cached.
+
+    Returns {"ids": {id: row or None}, "license_numbers": {number: row or None}}.
+    """
+    by_id = {business_id: _cache.get(("id", business_id)) for business_id in dict.fromkeys(ids)}
+    by_license = {number: _cache.get(("license", number)) for number in dict.fromkeys(license_numbers)}
+
+    missing_ids = [business_id for business_id, row in by_id.items() if row is None]
+    missing_licenses = [number for number, row in by_license.items() if row is None]
+    id_rows, license_rows = await asyncio.gather(
+        _fetch_many("id", missing_ids) if missing_ids else asyncio.sleep(0, []),
+        _fetch_many("license_number", missing_licenses) if missing_licenses else asyncio.sleep(0, []),
+    )
+    for row in id_rows:
+        by_id[row["id"]] = row
+    for row in license_rows:
+        by_license[row["license_number"]] = row
+    return {"ids": by_id, "license_numbers": by_license}
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {**_cache.stats(), "single_flight": _flights.stats()}
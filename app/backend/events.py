@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Optional, Set, Tuple
+
+from app.backend import metrics
+from app.backend.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+EVENTS_ENABLED = os.getenv("EVENTS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Each server process binds a datagram socket here and forwards the events it
+# publishes to every other socket in the directory, so streams on any worker
+# see writes handled by all of them. Workers must share this directory, i.e.
+# run on one host; a process that can't bind its socket doesn't serve events.
+EVENTS_SOCKET_DIR = os.getenv("EVENTS_SOCKET_DIR", "uploads/events")
+
+# Undelivered events kept per subscriber; a slow client that falls further
+# behind loses the oldest and is told to refetch
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+
+# Recent events kept for clients reconnecting with Last-Event-ID
+EVENTS_REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", "1000"))
+
+# Seconds between heartbeat comments, so proxies keep idle streams open
+EVENTS_HEARTBEAT_INTERVAL = float(os.getenv("EVENTS_HEARTBEAT_INTERVAL", "15"))
+
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "50000"))
+EVENTS_MAX_BUSINESSES = int(os.getenv("EVENTS_MAX_BUSINESSES", "100"))
+
+SUBSCRIBERS = metrics.Gauge("event_subscribers", "Open event streams.")
+PUBLISHED = metrics.Counter("events_published_total", "Events published, by type.", ("type",))
+DROPPED = metrics.Counter("events_dropped_total", "Events dropped from full subscriber queues.")
+
+HEARTBEAT = b": heartbeat\n\n"
+
+# Sent when events may have been missed; clients should refetch what they show
+RESET = b"event: reset\ndata: {}\n\n"
+
+
+class Subscription:
+    """One open stream and the events waiting to be written to it."""
+
+    __slots__ = ("business_ids", "pending", "wakeup", "lagged", "heartbeat_due")
+
+    def __init__(self, business_ids: Set[int]):
+        self.business_ids = business_ids
+        self.pending: Deque[bytes] = deque(maxlen=EVENTS_QUEUE_SIZE)
+        self.wakeup = asyncio.Event()
+        self.lagged = False
+        self.heartbeat_due = False
+
+    def push(self, frame: bytes) -> None:
+        if len(self.pending) == self.pending.maxlen:
+            # The deque drops the oldest frame on append
+            self.lagged = True
+            DROPPED.inc()
+        self.pending.append(frame)
+        self.wakeup.set()
+
+
+# business id -> open subscriptions for it
+_subscribers: Dict[int, Set[Subscription]] = {}
+_subscriptions: Set[Subscription] = set()
+
+# (event id, business id, frame), oldest first
+_recent: Deque[Tuple[int, int, bytes]] = deque(maxlen=EVENTS_REPLAY_SIZE)
+
+# Event ids are "<process id>-<sequence>". An id issued by another process
+# (including an earlier run of this one) can't be replayed here and gets a reset.
+_PROCESS_ID = uuid.uuid4().hex[:12]
+_next_id = 0
+
+# Set by start() once this process can exchange events with the others
+serving = False
+_socket: Optional[socket.socket] = None
+
+
+# Largest event forwarded between processes, in bytes
+_MAX_MESSAGE = 65536
+
+
+def _socket_path(process_id: str) -> str:
+    return os.path.join(EVENTS_SOCKET_DIR, f"{process_id}.sock")
+
+
+def start() -> None:
+    """Binds this process's socket and starts receiving events forwarded by the other processes.
+
+    On failure events are disabled for this process only, since serving them
+    would silently miss writes handled elsewhere.
+    """
+    global serving, _socket, _PROCESS_ID
+    if not EVENTS_ENABLED or _socket is not None:
+        return
+    # Workers forked from a preloaded app share the id chosen at import
+    _PROCESS_ID = uuid.uuid4().hex[:12]
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        os.makedirs(EVENTS_SOCKET_DIR, exist_ok=True)
+        sock.bind(_socket_path(_PROCESS_ID))
+        sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(sock.fileno(), _receive)
+    except OSError as e:
+        sock.close()
+        logger.warning(f"Live events disabled in this process, can't bind a socket in {EVENTS_SOCKET_DIR}: {str(e)}")
+        return
+    _socket, serving = sock, True
+
+
+def stop() -> None:
+    global serving, _socket
+    if _socket is None:
+        return
+    asyncio.get_running_loop().remove_reader(_socket.fileno())
+    _socket.close()
+    _socket, serving = None, False
+    try:
+        os.remove(_socket_path(_PROCESS_ID))
+    except FileNotFoundError:
+        pass
+
+
+def _forward(message: bytes) -> None:
+    """Sends a published event to every other process's socket."""
+    if len(message) > _MAX_MESSAGE:
+        logger.warning(f"Event of {len(message)} bytes is too large to forward to other processes")
+        return
+    try:
+        entries = list(os.scandir(EVENTS_SOCKET_DIR))
+    except OSError as e:
+        logger.error(f"Can't list event sockets: {str(e)}")
+        return
+    own = f"{_PROCESS_ID}.sock"
+    for entry in entries:
+        if not entry.name.endswith(".sock") or entry.name == own:
+            continue
+        try:
+            _socket.sendto(message, entry.path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Left behind by a process that exited without stop()
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        except OSError as e:
+            # e.g. the peer's receive buffer is full; its subscribers miss this event
+            DROPPED.inc()
+            logger.warning(f"Failed to forward event to {entry.name}: {str(e)}")
+
+
+def _receive() -> None:
+    while True:
+        try:
+            message = _socket.recv(_MAX_MESSAGE)
+        except BlockingIOError:
+            return
+        header, _, data = message.partition(b"\n")
+        event_type, _, business_id = header.decode().partition(" ")
+        _deliver(event_type, int(business_id), data.decode())
+
+
+def _sequence(event_id: str) -> Optional[int]:
+    """The sequence number of an event id issued by this process, else None."""
+    process_id, _, sequence = event_id.strip().partition("-")
+    if process_id != _PROCESS_ID or not sequence.isdigit():
+        return None
+    return int(sequence)
+
+
+def publish(event_type: str, row: Dict[str, Any], forward: bool = True) -> None:
+    """Queues an event about a row for every stream subscribed to its business.
+
+    Unless `forward` is false the event also goes to the other server
+    processes' streams.
+    """
+    business_id = row.get("business_id")
+    if business_id is None or not serving:
+        return
+    data = dumps({"type": event_type, "business_id": business_id, "data": row})
+    PUBLISHED.inc(type=event_type)
+    if forward:
+        _forward(f"{event_type} {business_id}\n".encode() + data)
+    _deliver(event_type, business_id, data.decode())
+
+
+def _deliver(event_type: str, business_id: int, data: str) -> None:
+    """Gives an event the next id of this process and queues it for local streams.
+
+    The frame is serialized once and shared by all subscribers.
+    """
+    global _next_id
+    _next_id += 1
+    frame = f"id: {_PROCESS_ID}-{_next_id}\nevent: {event_type}\ndata: {data}\n\n".encode()
+    _recent.append((_next_id, business_id, frame))
+    for subscription in _subscribers.get(business_id, ()):
+        subscription.push(frame)
+
+
+def subscriber_count() -> int:
+    return len(_subscriptions)
+
+
+def subscribe(business_ids: Iterable[int], last_event_id: Optional[str] = None) -> Subscription:
+    """Opens a subscription, first queueing events after `last_event_id` when it is still replayable."""
+    subscription = Subscription(set(business_ids))
+    if last_event_id is not None:
+        last = _sequence(last_event_id)
+        if last is None or last > _next_id:
+            # Issued by another process; what it missed can't be known here
+            subscription.push(RESET)
+        elif last < _next_id:
+            if not _recent or _recent[0][0] > last + 1:
+                # Events since then may have been evicted; the client refetches instead
+                subscription.push(RESET)
+            else:
+                for event_id, business_id, frame in _recent:
+                    if event_id > last and business_id in subscription.business_ids:
+                        subscription.push(frame)
+    for business_id in subscription.business_ids:
+        _subscribers.setdefault(business_id, set()).add(subscription)
+    _subscriptions.add(subscription)
+    SUBSCRIBERS.inc()
+    return subscription
+
+
+def unsubscribe(subscription: Subscription) -> None:
+    if subscription not in _subscriptions:
+        return
+    _subscriptions.discard(subscription)
+    SUBSCRIBERS.dec()
+    for business_id in subscription.business_ids:
+        subscribers = _subscribers.get(business_id)
+        if subscribers is None:
+            continue
+        subscribers.discard(subscription)
+        if not subscribers:
+            del _subscribers[business_id]
+
+
+async def stream(business_ids: Iterable[int], last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+    """Subscribes and yields SSE frames until the client disconnects."""
+    # Subscribing here rather than in the route means a response that is
+    # never sent leaves nothing behind
+    subscription = subscribe(business_ids, last_event_id)
+    try:
+        # Opens the stream right away, and sets the client's reconnect delay
+        yield b"retry: 5000\n\n"
+        while True:
+            await subscription.wakeup.wait()
+            subscription.wakeup.clear()
+            if subscription.lagged:
+                subscription.lagged = False
+                yield RESET
+            if subscription.pending:
+                frames = b"".join(subscription.pending)
+                subscription.pending.clear()
+                yield frames
+            elif subscription.heartbeat_due:
+                yield HEARTBEAT
+            subscription.heartbeat_due = False
+    finally:
+        unsubscribe(subscription)
+
+
+async def run_heartbeat() -> None:
+    """Wakes every stream periodically so idle connections send a heartbeat.
+
+    One timer for the whole process instead of one per stream keeps idle
+    subscribers down to a queue and an event each.
+    """
+    while True:
+        await asyncio.sleep(EVENTS_HEARTBEAT_INTERVAL)
+        for subscription in _subscriptions:
+            subscription.heartbeat_due = True
+            subscription.wakeup.set()
@@ -0,0 +1,204 @@
+import asyncio
+import bisect
+import logging
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.backend import db
+
+logger = logging.getLogger(__name__)
+
+# Tracked record kinds: kind -> (table, label column)
+EXPIRY_KINDS = {
+    "certification": ("certifications", "certificate_number"),
+    "batch": ("batch_production", "batch_number"),
+}
+
+EXPIRY_SWEEP_INTERVAL = float(os.getenv("EXPIRY_SWEEP_INTERVAL", "3600"))
+EXPIRY_WARNING_DAYS = int(os.getenv("EXPIRY_WARNING_DAYS", "30"))
+
+
+def _timestamp(value: Any) -> float:
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class ExpiryIndex:
+    """Certifications and batches kept sorted by expiry date.
+
+    Range queries bisect into the sorted keys, so they cost O(log n) plus the
+    size of the result rather than a scan over every record. Keys are also
+    kept per kind, so filtering by kind is just as cheap.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[float, str, int]] = []  # (expires_at, kind, id)
+        self._keys_by_kind: Dict[str, List[Tuple[float, str, int]]] = {kind: [] for kind in EXPIRY_KINDS}
+        self._records: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+    def add(self, kind: str, row: Dict[str, Any]) -> None:
+        if row.get("expiry_date") is None:
+            return
+        self.remove(kind, row["id"])
+        expires_at = _timestamp(row["expiry_date"])
+        label_column = EXPIRY_KINDS[kind][1]
+        self._records[(kind, row["id"])] = {
+            "kind": kind,
+            "id": row["id"],
+            "business_id": row.get("business_id"),
+            "label": row.get(label_column),
+            "expiry_date": datetime.fromtimestamp(expires_at, timezone.utc).isoformat(),
+            "expires_at": expires_at,
+        }
+        key = (expires_at, kind, row["id"])
+        bisect.insort(self._keys, key)
+        bisect.insort(self._keys_by_kind[kind], key)
+
+    def remove(self, kind: str, record_id: int) -> None:
+        record = self._records.pop((kind, record_id), None)
+        if record is not None:
+            key = (record["expires_at"], kind, record_id)
+            for keys in (self._keys, self._keys_by_kind[kind]):
+                i = bisect.bisect_left(keys, key)
+                if i < len(keys) and keys[i] == key:
+                    del keys[i]
+
+    def get(self, kind: str, record_id: int) -> Optional[Dict[str, Any]]:
+        return self._records.get((kind, record_id))
+
+    def _range(self, start: float, end: float, kind: Optional[str]) -> Tuple[List[Tuple[float, str, int]], int, int]:
+        keys = self._keys if kind is None else self._keys_by_kind[kind]
+        lo = bisect.bisect_left(keys, (start,))
+        hi = bisect.bisect_left(keys, (math.nextafter(end, math.inf),))
+        return keys, lo, hi
+
+    def between(self, start: float, end: float, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Records expiring in [start, end], soonest first."""
+        keys, lo, hi = self._range(start, end, kind)
+        return [self._records[(record_kind, record_id)] for _, record_kind, record_id in keys[lo:hi]]
+
+    def page(
+        self, start: float, end: float, offset: int, limit: int, kind: Optional[str] = None
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """The number of records expiring in [start, end] and one page of them, soonest first.
+
+        Only the page is copied, so wide windows cost no more than narrow ones.
+        """
+        keys, lo, hi = self._range(start, end, kind)
+        first = min(lo + offset, hi)
+        page = keys[first:min(first + limit, hi)]
+        return hi - lo, [self._records[(record_kind, record_id)] for _, record_kind, record_id in page]
+
+    def clear(self) -> None:
+        self._keys.clear()
+        for keys in self._keys_by_kind.values():
+            keys.clear()
+        self._records.clear()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+index = ExpiryIndex()
+loaded = False
+
+# Callbacks receiving ("expiring" | "expired", record) from the sweeper
+_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+
+# Each sweep announces the expiries and warnings that fell due in
+# (_swept_until, now]. It starts at process start, so a restart doesn't
+# announce every record that ever expired again.
+_started_at = datetime.now(timezone.utc).timestamp()
+_swept_until = _started_at
+
+# Records written after the sweeper already passed their expiry or warning
+# time, announced on the next sweep as (event, record)
+_late: List[Tuple[str, Dict[str, Any]]] = []
+
+
+# While load_all runs, writes also go to the index being built. Rows are
+# insert-only, so re-adding one the scan also reads is harmless.
+_building: Optional[ExpiryIndex] = None
+
+
+def _warning_seconds() -> float:
+    return timedelta(days=EXPIRY_WARNING_DAYS).total_seconds()
+
+
+def record(kind: str, row: Dict[str, Any]) -> None:
+    """Adds a newly written certification or batch to the index."""
+    index.add(kind, row)
+    if _building is not None:
+        _building.add(kind, row)
+    added = index.get(kind, row.get("id"))
+    if added is None:
+        return
+    # Backfilled records that were already due before this process started aren't announced
+    if _started_at < added["expires_at"] <= _swept_until:
+        _late.append(("expired", added))
+    elif _started_at < added["expires_at"] - _warning_seconds() <= _swept_until:
+        _late.append(("expiring", added))
+
+
+def subscribe(listener: Callable[[str, Dict[str, Any]], None]) -> None:
+    _listeners.append(listener)
+
+
+async def load_all(chunk_size: int = 5000) -> None:
+    """Builds the index from the certification and batch tables, swapping it in when complete."""
+    global index, loaded, _building
+    _building = ExpiryIndex()
+    try:
+        for kind, (table_name, label_column) in EXPIRY_KINDS.items():
+            async for rows in db.iter_rows(table_name, f"id,business_id,expiry_date,{label_column}", chunk_size=chunk_size):
+                for row in rows:
+                    _building.add(kind, row)
+        index, loaded = _building, True
+    finally:
+        _building = None
+    logger.info(f"Expiry index loaded with {len(index)} records")
+
+
+def _emit(event: str, record: Dict[str, Any]) -> None:
+    logger.info(f"{record['kind'].capitalize()} {record['label']} of business {record['business_id']} {event} ({record['expiry_date']})")
+    for listener in _listeners:
+        try:
+            listener(event, record)
+        except Exception as e:
+            logger.error(f"Expiry listener failed: {str(e)}")
+
+
+def sweep(now: Optional[float] = None) -> None:
+    """Announces records that expired, or came within EXPIRY_WARNING_DAYS of expiring, since the last sweep."""
+    global _swept_until
+    if now is None:
+        now = datetime.now(timezone.utc).timestamp()
+    if now <= _swept_until:
+        return
+    after = math.nextafter(_swept_until, math.inf)
+    warning = _warning_seconds()
+    late = _late[:]
+    _late.clear()
+    _swept_until = now
+    for record in index.between(after, now):
+        _emit("expired", record)
+    for record in index.between(after + warning, now + warning):
+        _emit("expiring", record)
+    for event, record in late:
+        _emit(event, record)
+
+
+async def run_sweeper() -> None:
+    while not loaded:
+        await asyncio.sleep(1)
+    while True:
+        try:
+            sweep()
+        except Exception as e:
+            logger.error(f"Expiry sweep failed: {str(e)}")
+        await asyncio.sleep(EXPIRY_SWEEP_INTERVAL)
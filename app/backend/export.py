@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.backend import db
+from app.backend.models import HygieneRating, Inspection, LabReport
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# Exportable tables: dataset -> (table, CSV columns, date column)
+EXPORT_DATASETS = {
+    "inspections": ("inspections", list(Inspection.__fields__), "date"),
+    "lab_reports": ("lab_reports", list(LabReport.__fields__), "date"),
+    "hygiene_ratings": ("hygiene_ratings", list(HygieneRating.__fields__), "date"),
+}
+
+
+async def _iter_chunks(
+    dataset: str,
+    business_id: Optional[int],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    table_name, _, date_column = EXPORT_DATASETS[dataset]
+
+    def filters(query):
+        if business_id is not None:
+            query = query.eq("business_id", business_id)
+        if date_from is not None:
+            query = query.gte(date_column, date_from.isoformat())
+        if date_to is not None:
+            query = query.lt(date_column, date_to.isoformat())
+        return query
+
+    async for rows in db.iter_rows(table_name, chunk_size=EXPORT_CHUNK_SIZE, filters=filters):
+        yield rows
+
+
+async def stream_ndjson(dataset: str, business_id=None, date_from=None, date_to=None) -> AsyncIterator[str]:
+    """Yields one JSON document per row, a page of rows at a time.
+
+    If reading fails part way, the stream ends with an `{"error": ...}`
+    record so clients can tell a truncated export from a complete one.
+    """
+    sent = 0
+    try:
+        async for rows in _iter_chunks(dataset, business_id, date_from, date_to):
+            yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+            sent += len(rows)
+    except Exception as e:
+        logger.error(f"Export of {dataset} failed after {sent} rows: {str(e)}")
+        yield json.dumps({"error": "Export failed before completion", "rows_sent": sent}) + "\n"
+
+
+async def stream_csv(dataset: str, business_id=None, date_from=None, date_to=None) -> AsyncIterator[str]:
+    """Yields a header line and then CSV rows, a page of rows at a time.
+
+    CSV has no room for an error record, so a failure part way is logged and
+    re-raised, which aborts the response instead of ending it cleanly.
+    """
+    columns = EXPORT_DATASETS[dataset][1]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+    sent = 0
+    try:
+        async for rows in _iter_chunks(dataset, business_id, date_from, date_to):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            sent += len(rows)
+    except Exception as e:
+        logger.error(f"Export of {dataset} failed after {sent} rows: {str(e)}")
+        raise
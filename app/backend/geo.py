@@ -0,0 +1,160 @@
+import logging
+import math
+import os
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.backend import db
+
+logger = logging.getLogger(__name__)
+
+# Grid cell size in degrees (0.01 is about 1.1 km north-south)
+GEO_CELL_DEGREES = float(os.getenv("GEO_CELL_DEGREES", "0.01"))
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Columns kept per business so results are served without a query
+RESULT_COLUMNS = ("id", "name", "business_type", "address", "latitude", "longitude")
+
+Cell = Tuple[int, int]
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance between two points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def valid_coordinates(latitude: Any, longitude: Any) -> bool:
+    try:
+        return -90 <= float(latitude) <= 90 and -180 <= float(longitude) <= 180
+    except (TypeError, ValueError):
+        return False
+
+
+class GeoIndex:
+    """Businesses bucketed into a fixed lat/lon grid.
+
+    A query only visits the cells overlapping its bounding box (or, when the
+    box covers more cells than are occupied, the occupied cells), so its cost
+    follows the number of nearby businesses rather than the total.
+    """
+
+    def __init__(self, cell_degrees: float = GEO_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Cell, Set[int]] = {}
+        self._documents: Dict[int, Dict[str, Any]] = {}
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees)
+
+    def add(self, business: Dict[str, Any]) -> None:
+        self.remove(business["id"])
+        if not valid_coordinates(business.get("latitude"), business.get("longitude")):
+            return
+        document = {column: business.get(column) for column in RESULT_COLUMNS}
+        document["latitude"], document["longitude"] = float(document["latitude"]), float(document["longitude"])
+        self._documents[business["id"]] = document
+        self._cells.setdefault(self._cell(document["latitude"], document["longitude"]), set()).add(business["id"])
+
+    def remove(self, business_id: int) -> None:
+        document = self._documents.pop(business_id, None)
+        if document is None:
+            return
+        cell = self._cell(document["latitude"], document["longitude"])
+        members = self._cells[cell]
+        members.discard(business_id)
+        if not members:
+            del self._cells[cell]
+
+    def _cells_in(self, south: float, west: float, north: float, east: float) -> Iterator[Cell]:
+        (lo_lat, lo_lon), (hi_lat, hi_lon) = self._cell(south, west), self._cell(north, east)
+        if (hi_lat - lo_lat + 1) * (hi_lon - lo_lon + 1) > len(self._cells):
+            return (cell for cell in self._cells if lo_lat <= cell[0] <= hi_lat and lo_lon <= cell[1] <= hi_lon)
+        return (
+            (lat, lon)
+            for lat in range(lo_lat, hi_lat + 1)
+            for lon in range(lo_lon, hi_lon + 1)
+            if (lat, lon) in self._cells
+        )
+
+    def within_box(self, south: float, west: float, north: float, east: float) -> List[Dict[str, Any]]:
+        """Businesses inside a bounding box. Boxes crossing the antimeridian have west > east."""
+        if west > east:
+            return self.within_box(south, west, north, 180.0) + self.within_box(south, -180.0, north, east)
+        return [
+            document
+            for cell in self._cells_in(south, west, north, east)
+            for document in (self._documents[business_id] for business_id in self._cells[cell])
+            if south <= document["latitude"] <= north and west <= document["longitude"] <= east
+        ]
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[float, Dict[str, Any]]]:
+        """(distance in km, business) within `radius_km` of a point, nearest first."""
+        lat_delta = radius_km / KM_PER_DEGREE
+        south, north = max(-90.0, latitude - lat_delta), min(90.0, latitude + lat_delta)
+        # Longitude degrees shrink towards the poles; near them, take every longitude
+        widest = max(abs(south), abs(north))
+        cos_lat = math.cos(math.radians(widest))
+        lon_delta = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+        if lon_delta >= 180:
+            candidates = self.within_box(south, -180.0, north, 180.0)
+        else:
+            west, east = longitude - lon_delta, longitude + lon_delta
+            west = west + 360 if west < -180 else west
+            east = east - 360 if east > 180 else east
+            candidates = self.within_box(south, west, north, east)
+        matches = []
+        for document in candidates:
+            distance = distance_km(latitude, longitude, document["latitude"], document["longitude"])
+            if distance <= radius_km:
+                matches.append((distance, document))
+        matches.sort(key=lambda match: (match[0], match[1]["id"]))
+        return matches
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+
+index = GeoIndex()
+loaded = False
+
+# While load_all runs, writes also go to the index being built, and the rows
+# they touched are skipped by the scan, which may have read them earlier.
+_building: Optional[GeoIndex] = None
+_written: Set[int] = set()
+
+
+def record(business: Dict[str, Any]) -> None:
+    """Indexes (or re-positions) a newly written or updated business row."""
+    index.add(business)
+    if _building is not None:
+        _building.add(business)
+        _written.add(business["id"])
+
+
+def forget(business_id: int) -> None:
+    """Drops a deleted business from the index."""
+    index.remove(business_id)
+    if _building is not None:
+        _building.remove(business_id)
+        _written.add(business_id)
+
+
+async def load_all(chunk_size: int = 5000) -> None:
+    """Builds the index from the businesses table, swapping it in when complete."""
+    global index, loaded, _building
+    _building = GeoIndex()
+    _written.clear()
+    try:
+        async for rows in db.iter_rows("businesses", ",".join(RESULT_COLUMNS), chunk_size=chunk_size):
+            for row in rows:
+                if row["id"] not in _written:
+                    _building.add(row)
+        index, loaded = _building, True
+    finally:
+        _building = None
+        _written.clear()
+    logger.info(f"Geo index loaded with {len(index)} businesses")
@@ -0,0 +1,80 @@
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images are stored as uploaded
+    Image = None
+
+# What Pillow raises for data it can't decode (UnidentifiedImageError is an OSError)
+DECODE_ERRORS = (OSError, ValueError, SyntaxError) + ((Image.DecompressionBombError,) if Image is not None else ())
+
+# Rendition name -> longest side in pixels (None keeps the original size)
+RENDITIONS = {
+    "thumbnail": int(os.getenv("IMAGE_THUMBNAIL_SIZE", "160")),
+    "medium": int(os.getenv("IMAGE_MEDIUM_SIZE", "800")),
+    "original": None,
+}
+
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "WEBP")
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_EXTENSION = IMAGE_FORMAT.lower().replace("jpeg", "jpg")
+IMAGE_CONTENT_TYPE = f"image/{IMAGE_FORMAT.lower()}"
+
+# Decoding and encoding are CPU-bound, so they run in worker processes
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 2)))
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def render(data: bytes) -> Dict[str, bytes]:
+    """Decodes an image and re-encodes every rendition without its metadata.
+
+    Runs in a worker process. Orientation from EXIF is applied to the pixels
+    first, since the EXIF block itself is not carried over.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        if IMAGE_FORMAT.upper() == "JPEG" and image.mode == "RGBA":
+            image = image.convert("RGB")
+
+        renditions = {}
+        for name, max_side in RENDITIONS.items():
+            rendition = image.copy()
+            if max_side:
+                rendition.thumbnail((max_side, max_side))
+            buffer = io.BytesIO()
+            rendition.save(buffer, IMAGE_FORMAT, quality=IMAGE_QUALITY, optimize=True)
+            renditions[name] = buffer.getvalue()
+        return renditions
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned rather than forked, so workers don't inherit the event loop,
+        # client sessions or locks held by other threads at fork time
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def make_renditions(data: bytes) -> Optional[Dict[str, bytes]]:
+    """Returns the encoded renditions of an image, or None when Pillow isn't installed.
+
+    Raises if the data can't be decoded as an image.
+    """
+    if Image is None:
+        return None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), render, data)
+
+
+def shutdown() -> None:
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
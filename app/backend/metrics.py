@@ -0,0 +1,227 @@
+import hmac
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this (seconds) log where their time went
+SLOW_REQUEST_THRESHOLD = float(os.getenv("SLOW_REQUEST_THRESHOLD", "1.0"))
+
+# Bearer token scrapers send to /metrics; the endpoint is disabled without one
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+# In-process caches reported at scrape time: name -> TTLCache.stats-style callable
+_caches: Dict[str, Callable[[], Dict]] = {}
+
+# (metric suffix, TYPE, stats key) exported for every registered cache
+_CACHE_FIELDS = (
+    ("size", "gauge", "size"),
+    ("hits_total", "counter", "hits"),
+    ("misses_total", "counter", "misses"),
+    ("evictions_total", "counter", "evictions"),
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        with self._lock:
+            samples = self._samples()
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *samples]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.label_names, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# ------------------- Metrics -------------------
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+REQUEST_ERRORS = Counter("http_request_errors_total", "Requests that raised or returned a 5xx.", ("method", "route"))
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Request latency by route.", ("method", "route"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.")
+QUERY_DURATION = Histogram("supabase_query_duration_seconds", "Supabase table query latency.", ("table", "operation"))
+QUERY_ERRORS = Counter("supabase_query_errors_total", "Failed Supabase table queries.", ("table", "operation"))
+UPLOAD_DURATION = Histogram(
+    "storage_upload_duration_seconds", "Storage upload latency.", ("outcome",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+UPLOAD_BYTES = Counter("storage_upload_bytes_total", "Bytes sent to storage.")
+AUTH_DURATION = Histogram("auth_duration_seconds", "Time spent resolving the current user.", ("source",))
+
+
+# ------------------- Per-request breakdown -------------------
+# category -> [seconds, calls] for the request being handled
+_breakdown: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_breakdown", default=None)
+
+
+def record_time(category: str, seconds: float) -> None:
+    """Adds time spent on `category` (db, storage, auth, serialize) to the current request."""
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        entry = breakdown.setdefault(category, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def track(category: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_time(category, time.perf_counter() - start)
+
+
+def start_request() -> Dict[str, List[float]]:
+    breakdown: Dict[str, List[float]] = {}
+    _breakdown.set(breakdown)
+    return breakdown
+
+
+def log_if_slow(method: str, route: str, status: int, seconds: float, breakdown: Dict[str, List[float]]) -> None:
+    if seconds < SLOW_REQUEST_THRESHOLD:
+        return
+    # Concurrent calls overlap, so category totals can add up to more than the wall time
+    parts = [f"{category} {total:.3f}s ({int(calls)} calls)" for category, (total, calls) in sorted(breakdown.items())]
+    accounted = sum(total for total, _ in breakdown.values())
+    parts.append(f"other {max(0.0, seconds - accounted):.3f}s")
+    logger.warning(f"Slow request {method} {route} -> {status} took {seconds:.3f}s: {', '.join(parts)}")
+
+
+# ------------------- Instrumentation helpers -------------------
+# PostgREST HTTP method -> query operation label
+_OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+def query_labels(query) -> Tuple[str, str]:
+    """(table, operation) for a PostgREST query builder."""
+    # Older postgrest-py keeps path/http_method on the builder, newer on builder.request
+    config = getattr(query, "request", query)
+    table = str(getattr(config, "path", "")).rstrip("/").rsplit("/", 1)[-1] or "unknown"
+    method = getattr(config, "http_method", "")
+    method = str(getattr(method, "value", method)).upper()
+    operation = _OPERATIONS.get(method) or getattr(query, "action", None) or "query"
+    return table, operation
+
+
+def observe_query(table: str, operation: str, seconds: float, failed: bool = False) -> None:
+    QUERY_DURATION.observe(seconds, table=table, operation=operation)
+    if failed:
+        QUERY_ERRORS.inc(table=table, operation=operation)
+    record_time("db", seconds)
+
+
+def register_cache(name: str, stats: Callable[[], Dict]) -> None:
+    """Exports a cache's size, hit, miss and eviction counters on /metrics."""
+    _caches[name] = stats
+
+
+def _cache_lines() -> List[str]:
+    snapshots = {name: stats() for name, stats in _caches.items()}
+    lines: List[str] = []
+    for suffix, kind, key in _CACHE_FIELDS:
+        lines.append(f"# TYPE cache_{suffix} {kind}")
+        for name, snapshot in snapshots.items():
+            lines.append(f'cache_{suffix}{{cache="{_escape(name)}"}} {snapshot.get(key, 0)}')
+    return lines
+
+
+def scrape_authorized(authorization: Optional[str]) -> bool:
+    """Whether an Authorization header carries METRICS_TOKEN as a bearer token."""
+    if not METRICS_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    if _caches:
+        lines.extend(_cache_lines())
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class User(BaseModel):
@@ -22,11 +22,25 @@ class Business(BaseModel):
     owner_name: str
     owner_photo_url: str
     logo_url: str
+    owner_photo_renditions: Optional[Dict[str, str]] = None
+    logo_renditions: Optional[Dict[str, str]] = None
     trade_license: str
     gst_number: str
     fire_safety_cert: str
     liquor_license: Optional[str] = None
     music_license: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+class BusinessLookup(BaseModel):
+    ids: List[int] = []
+    license_numbers: List[str] = []
+
+class ResumableUploadInit(BaseModel):
+    file_name: str
+    size: int
+    content_type: Optional[str] = None
+    sha256: Optional[str] = None
 
 class Inspection(BaseModel):
     id: Optional[int]
@@ -64,12 +78,14 @@ class TeamMember(BaseModel):
     name: str
     role: str
     photo_url: Optional[str]
+    photo_renditions: Optional[Dict[str, str]] = None
 
 class FacilityPhoto(BaseModel):
     id: Optional[int]
     business_id: int
     area_name: str
     photo_url: str
+    photo_renditions: Optional[Dict[str, str]] = None
 
 class Review(BaseModel):
     id: Optional[int]
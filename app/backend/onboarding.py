@@ -0,0 +1,313 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+logger = logging.getLogger(__name__)
+
+# Accepted onboarding requests (form fields as job.json plus their files) are
+# kept here until processed, so queued jobs survive a restart. Every server
+# process shares it: job.json is the only copy of a job's status, and a
+# worker holds an flock on the job's claim file while it runs an attempt.
+ONBOARDING_SPOOL_DIR = os.getenv("ONBOARDING_SPOOL_DIR", "uploads/onboarding")
+
+# Jobs processed at once; together with UPLOAD_CONCURRENCY this caps storage throughput
+ONBOARDING_WORKERS = int(os.getenv("ONBOARDING_WORKERS", "2"))
+ONBOARDING_MAX_ATTEMPTS = int(os.getenv("ONBOARDING_MAX_ATTEMPTS", "3"))
+
+# Seconds before the first retry, doubled for each later one
+ONBOARDING_RETRY_DELAY = float(os.getenv("ONBOARDING_RETRY_DELAY", "5"))
+
+# Finished jobs stay available to status polling for this long
+ONBOARDING_JOB_TTL = float(os.getenv("ONBOARDING_JOB_TTL", str(7 * 24 * 3600)))
+
+# Seconds between spool scans, which pick up due retries, jobs accepted by
+# other processes and jobs whose worker died
+ONBOARDING_POLL_INTERVAL = float(os.getenv("ONBOARDING_POLL_INTERVAL", "10"))
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+FINISHED = ("succeeded", "failed")
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class OnboardingJob:
+    """An accepted onboarding request and its progress."""
+
+    def __init__(self, owner_id: str, fields: Dict[str, Any], job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.fields = fields
+        self.files: List[Dict[str, Any]] = []  # {"role", "file_name", "content_type", "path"}
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.attempts = 0
+        self.business_id: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = self.updated_at = time.time()
+        self.next_attempt_at = 0.0
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(ONBOARDING_SPOOL_DIR, self.id)
+
+    def status_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "attempts": self.attempts,
+            "business_id": self.business_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "next_attempt_at": self.next_attempt_at,
+        }
+
+    def to_json(self) -> Dict[str, Any]:
+        return {**self.status_dict(), "owner_id": self.owner_id, "fields": self.fields, "files": self.files}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "OnboardingJob":
+        job = cls(data["owner_id"], data["fields"], data["job_id"])
+        job.files = data["files"]
+        for key in ("status", "stage", "attempts", "business_id", "error", "created_at", "updated_at"):
+            setattr(job, key, data[key])
+        job.next_attempt_at = data.get("next_attempt_at", 0.0)
+        return job
+
+    def save(self) -> None:
+        self.updated_at = time.time()
+        path = os.path.join(self.directory, "job.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.to_json(), f)
+        os.replace(f"{path}.tmp", path)
+
+    def open_files(self) -> Dict[str, List[UploadFile]]:
+        """The staged files by role, wrapped as uploads again."""
+        files: Dict[str, List[UploadFile]] = {}
+        for staged in self.files:
+            files.setdefault(staged["role"], []).append(UploadFile(
+                open(os.path.join(self.directory, staged["path"]), "rb"),
+                filename=staged["file_name"],
+                headers=Headers({"content-type": staged["content_type"] or "application/octet-stream"}),
+            ))
+        return files
+
+
+# Called with (job fields, staged files by role, owner id, progress callback,
+# business id recorded by an earlier attempt) and returns the business id.
+# progress(stage, business_id) records the id as soon as the business exists.
+Handler = Callable[
+    [Dict[str, Any], Dict[str, List[UploadFile]], str, Callable[..., None], Optional[int]], Awaitable[int]
+]
+
+_queue: Optional[asyncio.Queue] = None
+_queued: Set[str] = set()
+_handler: Optional[Handler] = None
+
+
+def load_job(job_id: str) -> Optional[OnboardingJob]:
+    """Reads a job's current state from the spool, or None if there is no such job."""
+    if not _JOB_ID.fullmatch(job_id):
+        return None
+    try:
+        with open(os.path.join(ONBOARDING_SPOOL_DIR, job_id, "job.json")) as f:
+            return OnboardingJob.from_json(json.load(f))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Skipping unreadable onboarding job {job_id}: {str(e)}")
+        return None
+
+
+def _claim(job_id: str) -> Optional[int]:
+    """Locks a job for this worker, returning the lock's descriptor, or None if it is taken.
+
+    The lock goes away with the descriptor, so a job whose process died can be
+    claimed again. The claim file is never removed while the job exists, since
+    a worker could otherwise lock a file that is no longer the job's.
+    """
+    try:
+        fd = os.open(os.path.join(ONBOARDING_SPOOL_DIR, job_id, "claim"), os.O_CREAT | os.O_RDWR)
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _enqueue(job_id: str) -> None:
+    if job_id not in _queued:
+        _queued.add(job_id)
+        _queue.put_nowait(job_id)
+
+
+def _spool(file: UploadFile, path: str) -> None:
+    """Copies an upload to the spool directory. Runs on a worker thread."""
+    file.file.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file.file, out, SPOOL_CHUNK_SIZE)
+
+
+async def submit(owner_id: str, fields: Dict[str, Any], files: Dict[str, List[UploadFile]]) -> OnboardingJob:
+    """Persists an onboarding request and queues it. `files` maps a role to its uploads."""
+    job = OnboardingJob(owner_id, fields)
+    os.makedirs(job.directory, exist_ok=True)
+    try:
+        for role, uploads in files.items():
+            for upload in uploads:
+                staged = {
+                    "role": role,
+                    "file_name": upload.filename or role,
+                    "content_type": upload.content_type,
+                    "path": str(len(job.files)),
+                }
+                await run_in_threadpool(_spool, upload, os.path.join(job.directory, staged["path"]))
+                job.files.append(staged)
+        job.save()
+    except Exception:
+        shutil.rmtree(job.directory, ignore_errors=True)
+        raise
+    _enqueue(job.id)
+    return job
+
+
+def get_job(job_id: str, owner_id: str) -> OnboardingJob:
+    job = load_job(job_id)
+    if job is None or job.owner_id != owner_id:
+        raise HTTPException(status_code=404, detail="Onboarding job not found")
+    return job
+
+
+def _retryable(error: Exception) -> bool:
+    # Rejected input fails the same way every time
+    return not (isinstance(error, HTTPException) and error.status_code < 500)
+
+
+async def _attempt(job: OnboardingJob) -> None:
+    """Runs one attempt of a claimed job, leaving it finished or scheduled for a retry."""
+    def progress(stage: str, business_id: Optional[int] = None) -> None:
+        job.stage = stage
+        if business_id is not None:
+            job.business_id = business_id
+        job.save()
+
+    job.attempts += 1
+    job.status, job.error = "processing", None
+    progress("starting")
+    files = job.open_files()
+    error: Optional[Exception] = None
+    try:
+        job.business_id = await _handler(job.fields, files, job.owner_id, progress, job.business_id)
+    except Exception as e:
+        error = e
+    finally:
+        for uploads in files.values():
+            for upload in uploads:
+                upload.file.close()
+
+    if error is None:
+        job.status, job.stage = "succeeded", "done"
+        job.save()
+        logger.info(f"Onboarding job {job.id} created business {job.business_id}")
+    else:
+        job.error = error.detail if isinstance(error, HTTPException) else str(error)
+        if job.attempts >= ONBOARDING_MAX_ATTEMPTS or not _retryable(error):
+            job.status = "failed"
+            job.save()
+            logger.error(f"Onboarding job {job.id} failed after {job.attempts} attempts: {job.error}")
+        else:
+            # Requeued rather than slept on, so the worker moves on meanwhile
+            delay = ONBOARDING_RETRY_DELAY * 2 ** (job.attempts - 1)
+            job.status, job.next_attempt_at = "retrying", time.time() + delay
+            job.save()
+            logger.warning(f"Onboarding job {job.id} attempt {job.attempts} failed, retrying in {delay:.0f}s: {job.error}")
+            asyncio.get_running_loop().call_later(delay, _enqueue, job.id)
+            return
+
+    # Only the status is needed from here on
+    for staged in job.files:
+        try:
+            os.remove(os.path.join(job.directory, staged["path"]))
+        except FileNotFoundError:
+            pass
+
+
+async def _run(job_id: str) -> None:
+    claim = _claim(job_id)
+    if claim is None:
+        # Another worker, possibly in another process, has it
+        return
+    try:
+        # Re-read under the claim; whoever held it before may have moved the job on
+        job = load_job(job_id)
+        if job is not None and job.status not in FINISHED and job.next_attempt_at <= time.time():
+            await _attempt(job)
+    finally:
+        os.close(claim)
+
+
+async def _worker() -> None:
+    while True:
+        job_id = await _queue.get()
+        _queued.discard(job_id)
+        try:
+            await _run(job_id)
+        except Exception as e:
+            logger.error(f"Onboarding worker error: {str(e)}")
+        finally:
+            _queue.task_done()
+
+
+def _scan() -> None:
+    """Queues due unfinished jobs from the spool and drops expired finished ones."""
+    if not os.path.isdir(ONBOARDING_SPOOL_DIR):
+        return
+    now = time.time()
+    cutoff = now - ONBOARDING_JOB_TTL
+    for name in sorted(os.listdir(ONBOARDING_SPOOL_DIR)):
+        job = load_job(name)
+        if job is None:
+            continue
+        if job.status in FINISHED:
+            if job.updated_at < cutoff:
+                shutil.rmtree(job.directory, ignore_errors=True)
+        elif job.next_attempt_at <= now:
+            _enqueue(job.id)
+
+
+async def _poll() -> None:
+    while True:
+        await asyncio.sleep(ONBOARDING_POLL_INTERVAL)
+        try:
+            _scan()
+        except Exception as e:
+            logger.error(f"Onboarding spool scan failed: {str(e)}")
+
+
+def start_workers(handler: Handler) -> List[asyncio.Task]:
+    """Queues spooled jobs and starts the worker pool and spool scanner; returns their tasks."""
+    global _queue, _handler
+    _handler = handler
+    _queue = asyncio.Queue()
+    _queued.clear()
+    os.makedirs(ONBOARDING_SPOOL_DIR, exist_ok=True)
+    _scan()
+    if _queue.qsize():
+        logger.info(f"Resuming {_queue.qsize()} queued onboarding jobs")
+    return [asyncio.create_task(_worker()) for _ in range(max(1, ONBOARDING_WORKERS))] + [asyncio.create_task(_poll())]
@@ -0,0 +1,93 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, List, Optional, Tuple, Type, Union, get_args, get_origin, get_type_hints
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.backend import db
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+
+def encode_cursor(row: dict, order_column: str) -> str:
+    """Encodes the keyset position just after `row`."""
+    payload = json.dumps([row.get(order_column), row["id"]], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return value, int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def cursor_value(value: Any, model: Type[BaseModel], order_column: str) -> str:
+    """Checks a decoded cursor value against the order column's type.
+
+    The value is interpolated into a PostgREST filter, so only a re-formatted
+    value of the column's own type is let through.
+    """
+    column_type = get_type_hints(model)[order_column]
+    if get_origin(column_type) is Union:
+        column_type = next(arg for arg in get_args(column_type) if arg is not type(None))
+    try:
+        if column_type is datetime and isinstance(value, str):
+            return datetime.fromisoformat(value).isoformat()
+        if column_type is int and isinstance(value, int) and not isinstance(value, bool):
+            return str(value)
+    except ValueError:
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def select_columns(fields: Optional[str], model: Type[BaseModel], order_column: str) -> str:
+    """Builds the select() projection for `fields=`, always keeping the keyset columns."""
+    if not fields:
+        return "*"
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in model.__fields__]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ",".join(dict.fromkeys(requested + [order_column, "id"]))
+
+
+async def fetch_page(
+    table_name: str,
+    business_id: int,
+    model: Type[BaseModel],
+    order_column: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetches one page of a business's rows, newest first, by keyset.
+
+    Rows are ordered by (order_column, id) descending and `after` is the cursor
+    returned with the previous page. Returns the rows and the cursor for the
+    next page, or None on the last page.
+    """
+    query = db.table(table_name).select(select_columns(fields, model, order_column)).eq("business_id", business_id)
+    if after:
+        value, last_id = decode_cursor(after)
+        if order_column == "id":
+            query = query.lt("id", last_id)
+        else:
+            value = cursor_value(value, model, order_column)
+            query = query.or_(f'{order_column}.lt."{value}",and({order_column}.eq."{value}",id.lt.{last_id})')
+    query = query.order(order_column, desc=True)
+    if order_column != "id":
+        query = query.order("id", desc=True)
+
+    # One extra row tells us whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.data or []
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1], order_column)
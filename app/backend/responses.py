@@ -0,0 +1,101 @@
+import hashlib
+import json
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, Optional, Set
+
+from fastapi import Request, Response
+
+from app.backend import metrics
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is used without it
+    orjson = None
+
+# Row columns checked, in order, for a Last-Modified date
+_MODIFIED_COLUMNS = ("updated_at", "created_at")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializes a response body, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, separators=(",", ":")).encode()
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    try:
+        parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _last_modified(content: Any) -> Optional[datetime]:
+    rows = content if isinstance(content, list) else [content]
+    latest = None
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        for column in _MODIFIED_COLUMNS:
+            if row.get(column):
+                modified = _parse_datetime(row[column])
+                if modified and (latest is None or modified > latest):
+                    latest = modified
+                break
+    return latest
+
+
+# One entity tag in an If-None-Match list, weak or strong
+_ENTITY_TAG = re.compile(r'\s*(?:W/)?("[^"]*")\s*(?:,|$)')
+
+
+def _if_none_match(header: str) -> Optional[Set[str]]:
+    """The opaque tags listed in an If-None-Match header, with any W/ prefix dropped.
+
+    Returns None for "*" and an empty set when the header can't be parsed.
+    """
+    if header.strip() == "*":
+        return None
+    tags, position = set(), 0
+    while position < len(header):
+        match = _ENTITY_TAG.match(header, position)
+        if match is None:
+            return set()
+        tags.add(match.group(1))
+        position = match.end()
+    return tags
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/"x" and "x" match each other.
+    # If-Modified-Since is not consulted: every response carries an ETag, and
+    # the newest timestamp of a list doesn't change when a row is deleted or
+    # edited without touching its timestamp columns.
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    tags = _if_none_match(header)
+    return tags is None or etag[2:] in tags
+
+
+def conditional_json(request: Request, content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Returns `content` as JSON with a weak ETag (and Last-Modified when rows carry timestamps).
+
+    The tag is weak because GZipMiddleware may compress the body after it is
+    computed, so the bytes sent differ by Accept-Encoding. Answers 304 with no
+    body when the client's If-None-Match shows it already has this representation.
+    """
+    with metrics.track("serialize"):
+        body = dumps(content)
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    response_headers = {"ETag": etag, "Cache-Control": "private, no-cache", **(headers or {})}
+    last_modified = _last_modified(content)
+    if last_modified:
+        response_headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=response_headers)
+    return Response(body, media_type="application/json", headers=response_headers)
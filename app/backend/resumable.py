@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Partially uploaded files are assembled here until they are complete, each
+# next to a <id>.json holding its session, so uploads survive a restart
+UPLOAD_STAGING_DIR = os.getenv("UPLOAD_STAGING_DIR", "uploads/staging")
+MAX_RESUMABLE_SIZE = int(os.getenv("MAX_RESUMABLE_SIZE", str(200 * 1024 * 1024)))
+MAX_CHUNK_SIZE = int(os.getenv("MAX_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+# Sessions with no activity for this long are discarded
+RESUMABLE_SESSION_TTL = float(os.getenv("RESUMABLE_SESSION_TTL", str(24 * 3600)))
+
+# Open sessions per user; each reserves up to MAX_RESUMABLE_SIZE on disk
+MAX_SESSIONS_PER_USER = int(os.getenv("MAX_SESSIONS_PER_USER", "10"))
+
+# Completed uploads are read into memory to be stored, so at most this many
+# are finished at once (bounding memory to this times MAX_RESUMABLE_SIZE)
+RESUMABLE_FINISH_CONCURRENCY = int(os.getenv("RESUMABLE_FINISH_CONCURRENCY", "2"))
+finish_slots = asyncio.Semaphore(max(1, RESUMABLE_FINISH_CONCURRENCY))
+
+
+class UploadSession:
+    """A file being uploaded in chunks, with the byte ranges received so far."""
+
+    def __init__(
+        self,
+        owner_id: str,
+        file_name: str,
+        size: int,
+        content_type: Optional[str],
+        sha256: Optional[str],
+        upload_id: Optional[str] = None,
+    ):
+        self.id = upload_id or uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.file_name = file_name
+        self.size = size
+        self.content_type = content_type
+        self.sha256 = sha256.lower() if sha256 else None
+        self.ranges: List[Tuple[int, int]] = []  # merged, sorted [start, end) ranges
+        self.updated_at = time.time()
+        self.path = os.path.join(UPLOAD_STAGING_DIR, self.id)
+        # Chunks are written on worker threads, possibly several at once
+        self._lock = threading.Lock()
+
+    def add_range(self, start: int, end: int) -> None:
+        with self._lock:
+            merged = []
+            for range_start, range_end in sorted(self.ranges + [(start, end)]):
+                if merged and range_start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+                else:
+                    merged.append((range_start, range_end))
+            self.ranges = merged
+            self.save()
+
+    @property
+    def metadata_path(self) -> str:
+        return f"{self.path}.json"
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "upload_id": self.id,
+            "owner_id": self.owner_id,
+            "file_name": self.file_name,
+            "size": self.size,
+            "content_type": self.content_type,
+            "sha256": self.sha256,
+            "ranges": [list(r) for r in self.ranges],
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "UploadSession":
+        session = cls(
+            data["owner_id"], data["file_name"], data["size"], data["content_type"], data["sha256"], data["upload_id"]
+        )
+        session.ranges = [tuple(r) for r in data["ranges"]]
+        session.updated_at = data["updated_at"]
+        return session
+
+    def save(self) -> None:
+        """Writes the session next to its staging file. Callers adding ranges hold the lock."""
+        self.updated_at = time.time()
+        with open(f"{self.metadata_path}.tmp", "w") as f:
+            json.dump(self.to_json(), f)
+        os.replace(f"{self.metadata_path}.tmp", self.metadata_path)
+
+    @property
+    def received(self) -> int:
+        """Length of the contiguous prefix received, i.e. where to resume."""
+        return self.ranges[0][1] if self.ranges and self.ranges[0][0] == 0 else 0
+
+    @property
+    def complete(self) -> bool:
+        return self.received == self.size
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "upload_id": self.id,
+            "file_name": self.file_name,
+            "size": self.size,
+            "received": self.received,
+            "ranges": [list(r) for r in self.ranges],
+            "complete": self.complete,
+        }
+
+
+_sessions: Dict[str, UploadSession] = {}
+
+
+def _remove(*paths: str) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _discard(session: UploadSession) -> None:
+    _sessions.pop(session.id, None)
+    _remove(session.metadata_path, session.path)
+
+
+def expire_sessions() -> None:
+    cutoff = time.time() - RESUMABLE_SESSION_TTL
+    for session in [s for s in _sessions.values() if s.updated_at < cutoff]:
+        logger.info(f"Discarding stale upload {session.id} ({session.file_name})")
+        _discard(session)
+
+
+def load_sessions() -> None:
+    """Reloads sessions saved by earlier runs and removes staging files that have none or went stale."""
+    if not os.path.isdir(UPLOAD_STAGING_DIR):
+        return
+    cutoff = time.time() - RESUMABLE_SESSION_TTL
+    names = set(os.listdir(UPLOAD_STAGING_DIR))
+    for name in names:
+        path = os.path.join(UPLOAD_STAGING_DIR, name)
+        if name.endswith(".json"):
+            try:
+                with open(path) as f:
+                    session = UploadSession.from_json(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Removing unreadable upload session {name}: {str(e)}")
+                _remove(path, path[:-len(".json")])
+                continue
+            if session.updated_at < cutoff or session.id not in names:
+                _discard(session)
+            else:
+                _sessions[session.id] = session
+        elif f"{name}.json" not in names:
+            # A staging file without a session (or a leftover .tmp) can't be resumed
+            _remove(path)
+    if _sessions:
+        logger.info(f"Resumed {len(_sessions)} upload sessions")
+
+
+def create_session(owner_id: str, file_name: str, size: int, content_type: Optional[str], sha256: Optional[str]) -> UploadSession:
+    if size <= 0 or size > MAX_RESUMABLE_SIZE:
+        raise HTTPException(status_code=400, detail=f"size must be between 1 and {MAX_RESUMABLE_SIZE} bytes")
+    expire_sessions()
+    if sum(1 for s in _sessions.values() if s.owner_id == owner_id) >= MAX_SESSIONS_PER_USER:
+        raise HTTPException(status_code=429, detail=f"At most {MAX_SESSIONS_PER_USER} uploads may be open at once")
+    os.makedirs(UPLOAD_STAGING_DIR, exist_ok=True)
+    session = UploadSession(owner_id, file_name, size, content_type, sha256)
+    session.save()
+    with open(session.path, "wb") as f:
+        f.truncate(size)
+    _sessions[session.id] = session
+    return session
+
+
+def get_session(upload_id: str, owner_id: str) -> UploadSession:
+    session = _sessions.get(upload_id)
+    if session is None or session.owner_id != owner_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+
+def write_chunk(session: UploadSession, offset: int, data: bytes, chunk_sha256: Optional[str] = None) -> None:
+    """Writes a chunk at `offset`. Runs on a worker thread."""
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty chunk")
+    if offset < 0 or offset + len(data) > session.size:
+        raise HTTPException(status_code=416, detail=f"Chunk exceeds declared size of {session.size} bytes")
+    if chunk_sha256 and hashlib.sha256(data).hexdigest() != chunk_sha256.lower():
+        raise HTTPException(status_code=400, detail="Chunk checksum mismatch")
+    with open(session.path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+    session.add_range(offset, offset + len(data))
+
+
+def finish(session: UploadSession) -> bytes:
+    """Verifies a complete upload and returns its bytes. Runs on a worker thread.
+
+    Callers hold one of `finish_slots` until they are done with the bytes.
+    """
+    if not session.complete:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete: {session.received} of {session.size} bytes")
+    with open(session.path, "rb") as f:
+        data = f.read()
+    if session.sha256 and hashlib.sha256(data).hexdigest() != session.sha256:
+        # The staged bytes are corrupt; the client has to start over
+        _discard(session)
+        raise HTTPException(status_code=422, detail="Upload checksum mismatch")
+    return data
+
+
+def discard(session: UploadSession) -> None:
+    _discard(session)
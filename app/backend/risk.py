@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.backend import db
+from app.backend.singleflight import SingleFlight
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; risk scoring is unavailable without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Risk factors, each scaled to 0 (no concern) .. 1 (highest concern), and
+# their default weight in the combined score
+FACTORS = ("inspection", "inspection_age", "hygiene", "lab_failures", "certification", "packaging", "reviews")
+DEFAULT_RISK_WEIGHTS = "inspection=3,inspection_age=2,hygiene=3,lab_failures=2,certification=1.5,packaging=1,reviews=1"
+
+# Largest weight accepted; scores are a weighted sum, so larger ones only risk overflow
+MAX_RISK_WEIGHT = 1000.0
+
+# Ratings run from RISK_RATING_MIN (worst) to RISK_RATING_MAX (best)
+RISK_RATING_MIN = float(os.getenv("RISK_RATING_MIN", "1"))
+RISK_RATING_MAX = float(os.getenv("RISK_RATING_MAX", "5"))
+
+# A business not inspected for this long gets the full inspection_age risk
+RISK_INSPECTION_MAX_AGE_DAYS = float(os.getenv("RISK_INSPECTION_MAX_AGE_DAYS", "365"))
+
+# Certification risk rises from 0 to 1 over this many days before the latest certificate expires
+RISK_CERTIFICATION_WARNING_DAYS = float(os.getenv("RISK_CERTIFICATION_WARNING_DAYS", "30"))
+
+RISK_REFRESH_INTERVAL = float(os.getenv("RISK_REFRESH_INTERVAL", "900"))
+
+# Lab report results counted as failures
+_LAB_FAILURE_RE = re.compile(r"\b(fail|failed|failure|unsatisfactory|non[- ]?compliant|rejected|unsafe|contaminated)\b", re.I)
+
+# Columns loaded per table
+TABLE_COLUMNS = {
+    "businesses": "id,name,business_type,address",
+    "inspections": "id,business_id,rating,date",
+    "hygiene_ratings": "id,business_id,rating,date",
+    "reviews": "id,business_id,rating",
+    "lab_reports": "id,business_id,result",
+    "certifications": "id,business_id,expiry_date",
+    "packaging_compliance": "id,business_id,fssai_compliant",
+}
+
+# Per-row conversions into the column arrays: table -> (name, row -> value)
+_CONVERTERS = {
+    "businesses": (
+        ("id", lambda row: row["id"]),
+        ("name", lambda row: row.get("name")),
+        ("business_type", lambda row: str(row.get("business_type") or "").lower()),
+        ("address", lambda row: row.get("address")),
+    ),
+    "inspections": (
+        ("business_id", lambda row: row["business_id"]),
+        ("rating", lambda row: float(row["rating"]) if row.get("rating") is not None else float("nan")),
+        ("date", lambda row: _timestamp(row.get("date"))),
+    ),
+    "hygiene_ratings": (
+        ("business_id", lambda row: row["business_id"]),
+        ("rating", lambda row: float(row["rating"]) if row.get("rating") is not None else float("nan")),
+        ("date", lambda row: _timestamp(row.get("date"))),
+    ),
+    "reviews": (
+        ("business_id", lambda row: row["business_id"]),
+        ("rating", lambda row: float(row["rating"]) if row.get("rating") is not None else float("nan")),
+    ),
+    "lab_reports": (
+        ("business_id", lambda row: row["business_id"]),
+        ("failed", lambda row: bool(_LAB_FAILURE_RE.search(str(row.get("result") or "")))),
+    ),
+    "certifications": (
+        ("business_id", lambda row: row["business_id"]),
+        ("expiry_date", lambda row: _timestamp(row.get("expiry_date"))),
+    ),
+    "packaging_compliance": (
+        ("business_id", lambda row: row["business_id"]),
+        ("failed", lambda row: row.get("fssai_compliant") is False),
+    ),
+}
+
+Columns = Dict[str, Dict[str, list]]
+
+
+def _timestamp(value: Any) -> float:
+    if value is None:
+        return float("nan")
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return float("nan")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def parse_weights(value: str, base: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Parses "factor=weight,..." into weights; factors not named keep their weight in `base` (the defaults)."""
+    weights = dict(DEFAULT_WEIGHTS if base is None else base)
+    for part in filter(None, (part.strip() for part in value.split(","))):
+        factor, _, weight = part.partition("=")
+        factor = factor.strip()
+        if factor not in FACTORS:
+            raise ValueError(f"Unknown risk factor: {factor}")
+        try:
+            weights[factor] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {factor}: {weight}")
+        if not math.isfinite(weights[factor]) or not 0 <= weights[factor] <= MAX_RISK_WEIGHT:
+            raise ValueError(f"Weight for {factor} must be between 0 and {MAX_RISK_WEIGHT:g}")
+    if not any(weights.values()):
+        raise ValueError("At least one risk weight must be positive")
+    return weights
+
+
+DEFAULT_WEIGHTS = parse_weights(DEFAULT_RISK_WEIGHTS + "," + os.getenv("RISK_WEIGHTS", ""), base={})
+
+
+class RiskTable:
+    """Every business's risk factors as one matrix, with scores for the default weights."""
+
+    def __init__(self, columns: Columns, now: float):
+        self.computed_at = now
+        businesses = columns["businesses"]
+        self.ids = np.asarray(businesses["id"], dtype=np.int64)
+        order = np.argsort(self.ids, kind="stable")
+        self.ids = self.ids[order]
+        self.names = [businesses["name"][i] for i in order]
+        self.addresses = [businesses["address"][i] for i in order]
+        self.types = np.asarray(businesses["business_type"], dtype=object)[order]
+        self.factors = np.zeros((len(self.ids), len(FACTORS)), dtype=np.float64)
+        self._fill_factors(columns, now)
+        self.scores = self.score(DEFAULT_WEIGHTS)
+
+    def _positions(self, business_ids: list) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Row positions for business ids, and which ids belong to a known business."""
+        business_ids = np.asarray(business_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, business_ids)
+        known = positions < len(self.ids)
+        known[known] = self.ids[positions[known]] == business_ids[known]
+        return positions, known
+
+    def _latest(self, table: Dict[str, list]) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Each business's most recent rating and its date (NaN where there is none)."""
+        latest = np.full(len(self.ids), np.nan)
+        latest_date = np.full(len(self.ids), np.nan)
+        positions, known = self._positions(table["business_id"])
+        ratings = np.asarray(table["rating"], dtype=np.float64)
+        dates = np.asarray(table["date"], dtype=np.float64)
+        keep = known & ~np.isnan(ratings)
+        positions, ratings, dates = positions[keep], ratings[keep], dates[keep]
+        # Undated rows sort first, so they only count when nothing is dated
+        order = np.lexsort((np.nan_to_num(dates, nan=-np.inf), positions))
+        positions, ratings, dates = positions[order], ratings[order], dates[order]
+        last = np.ones(len(positions), dtype=bool)
+        last[:-1] = positions[1:] != positions[:-1]
+        latest[positions[last]] = ratings[last]
+        latest_date[positions[last]] = dates[last]
+        return latest, latest_date
+
+    def _fraction(self, table: Dict[str, list], column: str) -> "np.ndarray":
+        """Per business, the share of rows where a boolean column is true (0 with no rows)."""
+        positions, known = self._positions(table["business_id"])
+        flags = np.asarray(table[column], dtype=np.float64)[known]
+        counts = np.bincount(positions[known], minlength=len(self.ids))
+        totals = np.bincount(positions[known], weights=flags, minlength=len(self.ids))
+        return np.divide(totals, counts, out=np.zeros(len(self.ids)), where=counts > 0)
+
+    def _fill_factors(self, columns: Columns, now: float) -> None:
+        span = RISK_RATING_MAX - RISK_RATING_MIN
+
+        def rating_risk(ratings: "np.ndarray", missing: float) -> "np.ndarray":
+            return np.where(np.isnan(ratings), missing, np.clip((RISK_RATING_MAX - ratings) / span, 0, 1))
+
+        inspection, inspected_at = self._latest(columns["inspections"])
+        hygiene, _ = self._latest(columns["hygiene_ratings"])
+
+        reviews = columns["reviews"]
+        positions, known = self._positions(reviews["business_id"])
+        ratings = np.asarray(reviews["rating"], dtype=np.float64)
+        known &= ~np.isnan(ratings)
+        review_counts = np.bincount(positions[known], minlength=len(self.ids))
+        review_totals = np.bincount(positions[known], weights=ratings[known], minlength=len(self.ids))
+        review_means = np.divide(
+            review_totals, review_counts, out=np.full(len(self.ids), np.nan), where=review_counts > 0
+        )
+
+        certifications = columns["certifications"]
+        positions, known = self._positions(certifications["business_id"])
+        expiry_dates = np.asarray(certifications["expiry_date"], dtype=np.float64)
+        known &= ~np.isnan(expiry_dates)
+        latest_expiry = np.full(len(self.ids), -np.inf)
+        np.maximum.at(latest_expiry, positions[known], expiry_dates[known])
+        warning = RISK_CERTIFICATION_WARNING_DAYS * 86400
+
+        factors = {
+            # Never inspected or rated counts as the worst case
+            "inspection": rating_risk(inspection, 1.0),
+            "inspection_age": np.where(
+                np.isnan(inspected_at), 1.0, np.clip((now - inspected_at) / (RISK_INSPECTION_MAX_AGE_DAYS * 86400), 0, 1)
+            ),
+            "hygiene": rating_risk(hygiene, 1.0),
+            "lab_failures": self._fraction(columns["lab_reports"], "failed"),
+            # No certificate at all is as risky as an expired one
+            "certification": np.clip((now + warning - latest_expiry) / warning, 0, 1),
+            "packaging": self._fraction(columns["packaging_compliance"], "failed"),
+            "reviews": rating_risk(review_means, 0.0),
+        }
+        for i, factor in enumerate(FACTORS):
+            self.factors[:, i] = factors[factor]
+
+    def score(self, weights: Dict[str, float]) -> "np.ndarray":
+        """Weighted risk from 0 to 100 for every business."""
+        vector = np.asarray([weights.get(factor, 0.0) for factor in FACTORS], dtype=np.float64)
+        return self.factors @ vector * (100.0 / vector.sum())
+
+    def _item(self, position: int, scores: "np.ndarray") -> Dict[str, Any]:
+        return {
+            "business_id": int(self.ids[position]),
+            "name": self.names[position],
+            "business_type": self.types[position] or None,
+            "address": self.addresses[position],
+            "score": round(float(scores[position]), 2),
+            "factors": {factor: round(float(value), 3) for factor, value in zip(FACTORS, self.factors[position])},
+        }
+
+    def queue(
+        self,
+        offset: int = 0,
+        limit: int = 50,
+        weights: Optional[Dict[str, float]] = None,
+        business_type: Optional[str] = None,
+        min_score: Optional[float] = None,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Total matches and one page of businesses, riskiest first (ties by id)."""
+        scores = self.scores if weights is None else self.score(weights)
+        candidates = np.arange(len(self.ids))
+        if business_type:
+            candidates = candidates[self.types == business_type.strip().lower()]
+        if min_score is not None:
+            candidates = candidates[scores[candidates] >= min_score]
+        wanted = offset + limit
+        page = candidates
+        if wanted < len(candidates):
+            # Only the requested page needs ordering, not every business; keep
+            # every tie with the last score on it so ties still break by id
+            cutoff = np.partition(scores[candidates], len(candidates) - wanted)[len(candidates) - wanted]
+            page = candidates[scores[candidates] >= cutoff]
+        # Positions follow id order, so sorting by position breaks score ties by id
+        page = page[np.lexsort((page, -scores[page]))][offset:wanted]
+        return len(candidates), [self._item(int(position), scores) for position in page]
+
+    def business(self, business_id: int) -> Optional[Dict[str, Any]]:
+        """One business's score, factors and rank in the queue (1 is riskiest)."""
+        positions, known = self._positions([business_id])
+        if not known[0]:
+            return None
+        position = int(positions[0])
+        item = self._item(position, self.scores)
+        score = self.scores[position]
+        item["rank"] = int(np.count_nonzero(self.scores > score) + np.count_nonzero(self.scores[:position] == score)) + 1
+        return item
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+table: Optional[RiskTable] = None
+
+_flight = SingleFlight("risk", enabled=True)
+
+
+async def _load_columns(table_name: str, chunk_size: int) -> Dict[str, list]:
+    converters = _CONVERTERS[table_name]
+    columns: Dict[str, list] = {name: [] for name, _ in converters}
+    async for rows in db.iter_rows(table_name, TABLE_COLUMNS[table_name], chunk_size=chunk_size):
+        for name, convert in converters:
+            columns[name].extend(convert(row) for row in rows)
+    return columns
+
+
+async def _recompute(chunk_size: int) -> Dict[str, Any]:
+    global table
+    start = time.perf_counter()
+    loaded = await asyncio.gather(*(_load_columns(table_name, chunk_size) for table_name in TABLE_COLUMNS))
+    columns = dict(zip(TABLE_COLUMNS, loaded))
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    # numpy releases the GIL for most of this, so it runs off the event loop
+    table = await run_in_threadpool(RiskTable, columns, datetime.now(timezone.utc).timestamp())
+    compute_seconds = time.perf_counter() - start
+    logger.info(f"Risk scores computed for {len(table)} businesses (load {load_seconds:.2f}s, compute {compute_seconds:.2f}s)")
+    return {
+        "businesses": len(table),
+        "rows": {table_name: len(next(iter(values.values()))) for table_name, values in columns.items()},
+        "load_seconds": round(load_seconds, 3),
+        "compute_seconds": round(compute_seconds, 3),
+    }
+
+
+async def recompute(chunk_size: int = 5000) -> Dict[str, Any]:
+    """Reloads the source tables and recomputes every score; concurrent calls share one run."""
+    if np is None:
+        raise RuntimeError("numpy is not installed")
+    return await _flight.do("recompute", lambda: _recompute(chunk_size))
+
+
+async def run_refresher() -> None:
+    if np is None:
+        logger.warning("numpy is not installed; risk scoring is disabled")
+        return
+    while True:
+        try:
+            await recompute()
+        except Exception as e:
+            logger.error(f"Risk score refresh failed: {str(e)}")
+        await asyncio.sleep(RISK_REFRESH_INTERVAL)
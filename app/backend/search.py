@@ -0,0 +1,236 @@
+import bisect
+import heapq
+import logging
+import os
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.backend import db
+
+logger = logging.getLogger(__name__)
+
+# Indexed business columns and how much a match in each counts towards the score
+SEARCH_FIELDS = {"name": 3.0, "business_type": 2.0, "owner_name": 1.5, "address": 1.0}
+
+# Columns kept per business so results are served without a query
+RESULT_COLUMNS = ("id", "name", "business_type", "address", "owner_name", "license_number")
+
+# Query terms at least this long also match tokens one edit away
+SEARCH_TYPO_MIN_LENGTH = int(os.getenv("SEARCH_TYPO_MIN_LENGTH", "4"))
+
+# Most index tokens a single prefix term expands to
+SEARCH_MAX_PREFIX_EXPANSIONS = int(os.getenv("SEARCH_MAX_PREFIX_EXPANSIONS", "50"))
+
+# Score multipliers by how a query term matched a token
+EXACT, PREFIX, TYPO = 1.0, 0.6, 0.4
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Any) -> List[str]:
+    """Lowercase, accent-free alphanumeric tokens."""
+    if not text:
+        return []
+    text = str(text).lower()
+    if not text.isascii():
+        normalized = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in normalized if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(text)
+
+
+def _deletions(token: str) -> Set[str]:
+    """The token with each single character removed."""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Whether one insert, delete or substitution turns `a` into `b`."""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return False
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    # Past the first difference the rest must line up, skipping one
+    # character of the longer string, or one of each for a substitution
+    return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+    """Inverted index over business names, types, addresses and owners.
+
+    Prefix matches bisect into the sorted token list. Typos are matched with a
+    deletion neighbourhood: every token is also filed under each of its
+    one-character deletions, so a query term finds tokens within one insert,
+    delete or substitution by looking up its own deletions. Tokens sharing a
+    deletion can be two edits apart ("abcd" and "bcde"), so candidates are
+    checked before they count.
+    """
+
+    def __init__(self, bulk: bool = False):
+        # In bulk mode the token list is sorted once by finish_bulk()
+        # instead of on every insert
+        self._bulk = bulk
+        self._postings: Dict[str, Dict[int, float]] = {}  # token -> {business id: field weight}
+        self._tokens: List[str] = []  # sorted keys of _postings
+        self._neighbours: Dict[str, Set[str]] = {}  # deletion variant -> tokens
+        self._documents: Dict[int, Dict[str, Any]] = {}
+        self._document_tokens: Dict[int, Dict[str, float]] = {}
+
+    def add(self, business: Dict[str, Any]) -> None:
+        business_id = business["id"]
+        self.remove(business_id)
+        weights: Dict[str, float] = {}
+        for field, weight in SEARCH_FIELDS.items():
+            for token in tokenize(business.get(field)):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if not self._bulk:
+                    bisect.insort(self._tokens, token)
+                for variant in _deletions(token) | {token}:
+                    self._neighbours.setdefault(variant, set()).add(token)
+            postings[business_id] = weight
+        self._documents[business_id] = {column: business.get(column) for column in RESULT_COLUMNS}
+        self._document_tokens[business_id] = weights
+
+    def remove(self, business_id: int) -> None:
+        self._documents.pop(business_id, None)
+        for token in self._document_tokens.pop(business_id, {}):
+            postings = self._postings[token]
+            postings.pop(business_id, None)
+            if postings:
+                continue
+            del self._postings[token]
+            i = bisect.bisect_left(self._tokens, token)
+            if i < len(self._tokens) and self._tokens[i] == token:
+                del self._tokens[i]
+            for variant in _deletions(token) | {token}:
+                tokens = self._neighbours[variant]
+                tokens.discard(token)
+                if not tokens:
+                    del self._neighbours[variant]
+
+    def _matches(self, term: str, prefix: bool) -> Dict[str, float]:
+        """Index tokens matching a query term, with the multiplier for each."""
+        matches: Dict[str, float] = {}
+        if len(term) >= SEARCH_TYPO_MIN_LENGTH:
+            for variant in _deletions(term) | {term}:
+                for token in self._neighbours.get(variant, ()):
+                    if token not in matches and _within_one_edit(term, token):
+                        matches[token] = TYPO
+        if prefix:
+            start = bisect.bisect_left(self._tokens, term)
+            for token in self._tokens[start:start + SEARCH_MAX_PREFIX_EXPANSIONS]:
+                if not token.startswith(term):
+                    break
+                matches[token] = PREFIX
+        if term in self._postings:
+            matches[term] = EXACT
+        return matches
+
+    def search(
+        self, query: str, business_type: Optional[str] = None, offset: int = 0, limit: Optional[int] = None
+    ) -> Tuple[int, List[Tuple[float, int]]]:
+        """Total matches and one page of (score, business id), best first.
+
+        A business matches when every query term matches one of its tokens
+        exactly, as a prefix or with one typo; exact matches score highest.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+
+        term_scores: List[Dict[int, float]] = []
+        for term in terms:
+            scores: Dict[int, float] = {}
+            for token, multiplier in self._matches(term, prefix=True).items():
+                for business_id, weight in self._postings[token].items():
+                    score = weight * multiplier
+                    if score > scores.get(business_id, 0.0):
+                        scores[business_id] = score
+            if not scores:
+                return 0, []
+            term_scores.append(scores)
+
+        # Intersect from the rarest term so the candidate set only shrinks
+        term_scores.sort(key=len)
+        totals = dict(term_scores[0])
+        for scores in term_scores[1:]:
+            totals = {business_id: total + scores[business_id] for business_id, total in totals.items() if business_id in scores}
+
+        wanted_type = business_type.strip().lower() if business_type else None
+        ranked = [
+            (score, business_id)
+            for business_id, score in totals.items()
+            if wanted_type is None or str(self._documents[business_id].get("business_type") or "").lower() == wanted_type
+        ]
+        order = lambda item: (-item[0], str(self._documents[item[1]].get("name") or ""), item[1])
+        if limit is None:
+            return len(ranked), sorted(ranked, key=order)[offset:]
+        # Only the requested page needs ordering, not every match
+        return len(ranked), heapq.nsmallest(offset + limit, ranked, key=order)[offset:]
+
+    def finish_bulk(self) -> None:
+        self._tokens = sorted(self._postings)
+        self._bulk = False
+
+    def document(self, business_id: int) -> Dict[str, Any]:
+        return self._documents[business_id]
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._tokens.clear()
+        self._neighbours.clear()
+        self._documents.clear()
+        self._document_tokens.clear()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+
+index = SearchIndex()
+loaded = False
+
+# While load_all runs, writes also go to the index being built, and the rows
+# they touched are skipped by the scan, which may have read them earlier.
+_building: Optional[SearchIndex] = None
+_written: Set[int] = set()
+
+
+def record(business: Dict[str, Any]) -> None:
+    """Indexes a newly written or updated business row."""
+    index.add(business)
+    if _building is not None:
+        _building.add(business)
+        _written.add(business["id"])
+
+
+def forget(business_id: int) -> None:
+    """Drops a deleted business from the index."""
+    index.remove(business_id)
+    if _building is not None:
+        _building.remove(business_id)
+        _written.add(business_id)
+
+
+async def load_all(chunk_size: int = 5000) -> None:
+    """Builds the index from the businesses table, swapping it in when complete."""
+    global index, loaded, _building
+    _building = SearchIndex(bulk=True)
+    _written.clear()
+    try:
+        async for rows in db.iter_rows("businesses", ",".join(RESULT_COLUMNS), chunk_size=chunk_size):
+            for row in rows:
+                if row["id"] not in _written:
+                    _building.add(row)
+        _building.finish_bulk()
+        index, loaded = _building, True
+    finally:
+        _building = None
+        _written.clear()
+    logger.info(f"Search index loaded with {len(index)} businesses")
@@ -0,0 +1,62 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from app.backend import metrics
+
+# Comma-separated group names (a read route's table, e.g. "hygiene_ratings")
+# whose concurrent identical reads share one query; "*" enables every group.
+SINGLE_FLIGHT_GROUPS = {
+    name.strip() for name in os.getenv("SINGLE_FLIGHT_GROUPS", "businesses,hygiene_ratings").split(",") if name.strip()
+}
+
+COALESCED = metrics.Counter(
+    "single_flight_calls_total", "Reads by whether they ran a query or joined one in flight.", ("group", "outcome")
+)
+
+T = TypeVar("T")
+
+
+def _consume(future: asyncio.Future) -> None:
+    # Retrieve the exception so a call every waiter gave up on isn't logged as unhandled
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    Only calls that are in flight are shared; once a call finishes, the next
+    caller starts a new one, so no result outlives its query. Callers should
+    put anything that makes results differ (including db.write_generation)
+    into the key.
+    """
+
+    def __init__(self, name: str, enabled: Optional[bool] = None):
+        self.name = name
+        self.enabled = (name in SINGLE_FLIGHT_GROUPS or "*" in SINGLE_FLIGHT_GROUPS) if enabled is None else enabled
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Awaits fn(), or the in-flight call already running for `key`."""
+        if not self.enabled:
+            return await fn()
+
+        future = self._calls.get(key)
+        if future is not None:
+            COALESCED.inc(group=self.name, outcome="shared")
+        else:
+            COALESCED.inc(group=self.name, outcome="executed")
+            # A task, so one waiter being cancelled doesn't cancel the query for the rest
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        _consume(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "in_flight": len(self._calls)}
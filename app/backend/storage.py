@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException, UploadFile
+
+from app.backend import db, images, metrics
+from app.backend.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BUCKET = os.getenv("STORAGE_BUCKET", "food-safety-files")
+
+# Maximum number of files a single request uploads to storage at the same time.
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+
+# Read size used when hashing uploads
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Objects are stored under the SHA-256 of their content, so a path that exists
+# already holds the right bytes. Known paths are remembered to skip the
+# existence check on repeat uploads.
+_known_objects = TTLCache(maxsize=int(os.getenv("KNOWN_OBJECTS_CACHE_SIZE", "10000")), ttl=3600)
+
+T = TypeVar("T")
+
+
+def _put_object(path: str, data: bytes, content_type: Optional[str]) -> None:
+    file_options = {"content-type": content_type} if content_type else None
+    db.bucket(STORAGE_BUCKET).upload(path, data, file_options)
+
+
+async def _read(file: UploadFile) -> bytes:
+    await file.seek(0)
+    return await file.read()
+
+
+async def upload_bytes(data: bytes, path: str, content_type: Optional[str]) -> str:
+    """Stores bytes at a storage path and returns the public URL."""
+    start = time.perf_counter()
+    try:
+        await db.run(_put_object, path, data, content_type)
+    except Exception as e:
+        metrics.UPLOAD_DURATION.observe(time.perf_counter() - start, outcome="error")
+        raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
+    finally:
+        metrics.record_time("storage", time.perf_counter() - start)
+    metrics.UPLOAD_DURATION.observe(time.perf_counter() - start, outcome="success")
+    metrics.UPLOAD_BYTES.inc(len(data))
+    return db.bucket(STORAGE_BUCKET).get_public_url(path)
+
+
+async def _hash_file(file: UploadFile) -> str:
+    """SHA-256 of an upload, read in chunks so the file is never fully in memory."""
+    await file.seek(0)
+    digest = hashlib.sha256()
+    while True:
+        chunk = await file.read(HASH_CHUNK_SIZE)
+        if not chunk:
+            return digest.hexdigest()
+        digest.update(chunk)
+
+
+def _object_exists(path: str) -> bool:
+    folder, name = path.rsplit("/", 1)
+    matches = db.bucket(STORAGE_BUCKET).list(folder, {"search": name, "limit": 100})
+    return any(item.get("name") == name for item in matches or [])
+
+
+async def _exists(path: str) -> bool:
+    if _known_objects.get(path):
+        return True
+    with metrics.track("storage"):
+        found = await db.run(_object_exists, path)
+    if found:
+        _known_objects.set(path, True)
+        return True
+    return False
+
+
+async def store_once(
+    path: str,
+    load: Callable[[], Awaitable[bytes]],
+    content_type: Optional[str],
+) -> str:
+    """Uploads to a content-addressed path unless the object is already there.
+
+    `load` is only awaited when the object has to be uploaded. Returns the
+    public URL either way.
+
+    Objects are never deleted once stored: another record may reference the
+    same content, so a failed request can't tell which objects are its own.
+    """
+    if not await _exists(path):
+        try:
+            await upload_bytes(await load(), path, content_type)
+        except HTTPException:
+            # Another request may have stored the same content meanwhile
+            if not await db.run(_object_exists, path):
+                raise
+        _known_objects.set(path, True)
+    return db.bucket(STORAGE_BUCKET).get_public_url(path)
+
+
+def _extension(file_name: str) -> str:
+    return file_name.rsplit(".", 1)[-1].lower() if "." in file_name else "bin"
+
+
+# Helper function to upload a file to Supabase storage and get its URL
+async def upload_file(file: UploadFile, file_name: str) -> str:
+    """Stores an uploaded file under its content hash and returns its public URL.
+
+    Identical content is uploaded once; later uploads reuse the stored object.
+    """
+    digest = await _hash_file(file)
+    path = f"uploads/sha256/{digest}.{_extension(file_name)}"
+    return await store_once(path, lambda: _read(file), file.content_type)
+
+
+async def store_content(data: bytes, file_name: str, content_type: Optional[str]) -> str:
+    """Stores bytes already in memory under their content hash and returns the public URL."""
+    path = f"uploads/sha256/{hashlib.sha256(data).hexdigest()}.{_extension(file_name)}"
+    return await store_once(path, lambda: _async_value(data), content_type)
+
+
+async def upload_image(
+    file: UploadFile,
+    file_name: str,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> Tuple[str, Dict[str, str]]:
+    """Stores an image as compressed, metadata-free renditions.
+
+    Returns the URL of the full-size rendition and the URLs of every rendition
+    by name. Renditions are keyed by the hash of the uploaded bytes, so an image
+    that was stored before is neither re-processed nor re-uploaded. Files that
+    can't be decoded are rejected with a 400; only when Pillow isn't installed
+    is a file stored as uploaded, under the "original" rendition.
+
+    `semaphore` bounds the storage calls and image processing; upload_images
+    shares one across all its images.
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, UPLOAD_CONCURRENCY))
+    digest = await _hash_file(file)
+    base = f"uploads/sha256/{digest}"
+    rendition_paths = {name: f"{base}_{name}.{images.IMAGE_EXTENSION}" for name in images.RENDITIONS}
+
+    if images.Image is None:
+        async with semaphore:
+            url = await upload_file(file, file_name)
+        return url, {"original": url}
+
+    stored = await _run_limited([lambda path=path: _exists(path) for path in rendition_paths.values()], semaphore)
+    if all(stored):
+        urls = {name: db.bucket(STORAGE_BUCKET).get_public_url(path) for name, path in rendition_paths.items()}
+        return urls["original"], urls
+    data = await _read(file)
+    async with semaphore:
+        try:
+            renditions = await images.make_renditions(data)
+        except images.DECODE_ERRORS as e:
+            logger.warning(f"Rejected image {file_name}: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Could not read image {file_name}")
+
+    names = list(renditions)
+    urls = await _run_limited(
+        [
+            lambda name=name: store_once(
+                rendition_paths[name], lambda: _async_value(renditions[name]), images.IMAGE_CONTENT_TYPE
+            )
+            for name in names
+        ],
+        semaphore,
+    )
+    rendition_urls = dict(zip(names, urls))
+    return rendition_urls["original"], rendition_urls
+
+
+async def _async_value(value: T) -> T:
+    return value
+
+
+async def _settle(awaitables: List[Awaitable[T]]) -> List[T]:
+    # Every job is allowed to settle before the first failure is raised, so no
+    # upload is left running after the caller has given up on the request
+    results = await asyncio.gather(*awaitables, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+async def _run_limited(jobs: List[Callable[[], Awaitable[T]]], semaphore: asyncio.Semaphore) -> List[T]:
+    async def run_one(job: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            return await job()
+
+    return await _settle([run_one(job) for job in jobs])
+
+
+async def upload_files(
+    uploads: List[Tuple[UploadFile, str]],
+    limit: int = UPLOAD_CONCURRENCY,
+) -> List[str]:
+    """Uploads (file, file_name) pairs concurrently, at most `limit` at a time.
+
+    Returns the public URLs in the same order as `uploads`.
+    """
+    return await _run_limited(
+        [lambda file=file, file_name=file_name: upload_file(file, file_name) for file, file_name in uploads],
+        asyncio.Semaphore(max(1, limit)),
+    )
+
+
+async def upload_images(
+    uploads: List[Tuple[UploadFile, str]],
+    limit: int = UPLOAD_CONCURRENCY,
+) -> List[Tuple[str, Dict[str, str]]]:
+    """Like upload_files, but stores each file through upload_image.
+
+    The images share one semaphore for their storage calls and processing, so
+    at most `limit` of those run at a time across all images and renditions.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+    return await _settle([upload_image(file, file_name, semaphore) for file, file_name in uploads])
+
@@ -0,0 +1,275 @@
+import bisect
+import logging
+import math
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.backend import db
+
+logger = logging.getLogger(__name__)
+
+SUPPLIER_COLUMNS = "id,business_id,supplier_name,materials_provided,origin_country,traceability_info,compliance_status"
+BATCH_COLUMNS = "id,business_id,batch_number,manufacturing_date,expiry_date"
+
+SUPPLIER_RESULT_KEYS = ("id", "supplier_name", "origin_country", "traceability_info", "compliance_status")
+BATCH_RESULT_KEYS = ("id", "batch_number", "manufacturing_date", "expiry_date")
+
+# Separators between materials in the free-text materials_provided column
+_MATERIAL_SPLIT_RE = re.compile(r"[,;/\n|]|\band\b|&")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: Any) -> str:
+    """Lowercase alphanumeric words joined by single spaces."""
+    return " ".join(_TOKEN_RE.findall(str(text or "").lower()))
+
+
+def parse_materials(materials_provided: Any) -> Set[str]:
+    """Splits a materials_provided value ("Wheat flour, sugar & salt") into normalized materials."""
+    return {material for material in (normalize(part) for part in _MATERIAL_SPLIT_RE.split(str(materials_provided or ""))) if material}
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class TraceabilityGraph:
+    """Supplier -> material -> business -> batch links.
+
+    Suppliers are identified by normalized name across businesses, so one
+    recalled supplier reaches every business that lists it. Materials are also
+    indexed by word, so recalling "peanut" finds "roasted peanut" and
+    "peanut oil".
+    """
+
+    def __init__(self):
+        # (supplier, material) -> {business id: supplier row ids}
+        self._edges: Dict[Tuple[str, str], Dict[int, Set[int]]] = {}
+        self._supplier_materials: Dict[str, Set[str]] = {}
+        self._material_suppliers: Dict[str, Set[str]] = {}
+        self._material_words: Dict[str, Set[str]] = {}
+        self._supplier_rows: Dict[int, Dict[str, Any]] = {}
+        self._batches: Dict[int, Dict[str, Any]] = {}
+        # business id -> sorted (expires_at, batch id), so in-date batches are a suffix
+        self._business_batches: Dict[int, List[Tuple[float, int]]] = {}
+
+    def add_supplier(self, row: Dict[str, Any]) -> None:
+        self.remove_supplier(row["id"])
+        supplier = normalize(row.get("supplier_name"))
+        if not supplier:
+            return
+        materials = parse_materials(row.get("materials_provided"))
+        self._supplier_rows[row["id"]] = {
+            "id": row["id"],
+            "business_id": row["business_id"],
+            "supplier": supplier,
+            "supplier_name": row.get("supplier_name"),
+            "materials": materials,
+            "origin_country": row.get("origin_country"),
+            "origin": normalize(row.get("origin_country")),
+            "traceability_info": row.get("traceability_info"),
+            "compliance_status": row.get("compliance_status"),
+        }
+        for material in materials:
+            self._edges.setdefault((supplier, material), {}).setdefault(row["business_id"], set()).add(row["id"])
+            self._supplier_materials.setdefault(supplier, set()).add(material)
+            self._material_suppliers.setdefault(material, set()).add(supplier)
+            for word in material.split():
+                self._material_words.setdefault(word, set()).add(material)
+
+    def remove_supplier(self, row_id: int) -> None:
+        row = self._supplier_rows.pop(row_id, None)
+        if row is None:
+            return
+        supplier = row["supplier"]
+        for material in row["materials"]:
+            businesses = self._edges[(supplier, material)]
+            row_ids = businesses[row["business_id"]]
+            row_ids.discard(row_id)
+            if row_ids:
+                continue
+            del businesses[row["business_id"]]
+            if businesses:
+                continue
+            del self._edges[(supplier, material)]
+            self._discard(self._supplier_materials, supplier, material)
+            if material not in self._material_suppliers or not self._discard(self._material_suppliers, material, supplier):
+                continue
+            for word in material.split():
+                self._discard(self._material_words, word, material)
+
+    @staticmethod
+    def _discard(mapping: Dict[str, Set[str]], key: str, value: str) -> bool:
+        """Removes value from mapping[key]; True if that emptied (and dropped) the key."""
+        values = mapping[key]
+        values.discard(value)
+        if not values:
+            del mapping[key]
+            return True
+        return False
+
+    def add_batch(self, row: Dict[str, Any]) -> None:
+        expires_at = _timestamp(row.get("expiry_date"))
+        previous = self._batches.get(row["id"])
+        if previous is not None:
+            self._business_batches[previous["business_id"]].remove((previous["expires_at"], row["id"]))
+        self._batches[row["id"]] = {
+            "id": row["id"],
+            "business_id": row["business_id"],
+            "batch_number": row.get("batch_number"),
+            "manufacturing_date": row.get("manufacturing_date"),
+            "expiry_date": row.get("expiry_date"),
+            "manufactured_at": _timestamp(row.get("manufacturing_date")),
+            # Batches without an expiry date never leave the in-date range
+            "expires_at": math.inf if expires_at is None else expires_at,
+        }
+        bisect.insort(self._business_batches.setdefault(row["business_id"], []), (self._batches[row["id"]]["expires_at"], row["id"]))
+
+    def _batches_for(self, business_id: int, after: float, since: Optional[float]) -> List[Dict[str, Any]]:
+        """A business's batches expiring at or after `after`, soonest first."""
+        batches = self._business_batches.get(business_id, [])
+        found = (self._batches[batch_id] for _, batch_id in batches[bisect.bisect_left(batches, (after,)):])
+        if since is not None:
+            found = (batch for batch in found if batch["manufactured_at"] is not None and batch["manufactured_at"] >= since)
+        return list(found)
+
+    def _count_batches(self, business_id: int, after: float, since: Optional[float]) -> int:
+        if since is not None:
+            return len(self._batches_for(business_id, after, since))
+        batches = self._business_batches.get(business_id, [])
+        return len(batches) - bisect.bisect_left(batches, (after,))
+
+    def _materials_matching(self, material: str) -> Set[str]:
+        words = material.split()
+        matches = set(self._material_words.get(words[0], ()))
+        for word in words[1:]:
+            matches &= self._material_words.get(word, set())
+        return matches
+
+    def recall(
+        self,
+        supplier: Optional[str] = None,
+        material: Optional[str] = None,
+        origin_country: Optional[str] = None,
+        since: Optional[float] = None,
+        now: Optional[float] = None,
+        include_expired: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Businesses and batches reached from a supplier, a material, or a supplier's material.
+
+        `origin_country` narrows the match to supplier rows from that country.
+        Batches are those of affected businesses that are still in date (unless
+        include_expired) and, with `since`, manufactured at or after it. Only
+        the requested page of businesses is expanded into full entries.
+        """
+        supplier_key, material_key, origin = normalize(supplier), normalize(material), normalize(origin_country)
+        if material_key and supplier_key:
+            materials = self._materials_matching(material_key) & self._supplier_materials.get(supplier_key, set())
+            pairs = [(supplier_key, matched) for matched in materials]
+        elif material_key:
+            pairs = [
+                (supplier_name, matched)
+                for matched in self._materials_matching(material_key)
+                for supplier_name in self._material_suppliers.get(matched, ())
+            ]
+        else:
+            pairs = [(supplier_key, matched) for matched in self._supplier_materials.get(supplier_key, ())]
+
+        # business id -> the (supplier, material) edges reaching it
+        affected: Dict[int, List[Tuple[str, str]]] = {}
+        matched_pairs: Set[Tuple[str, str]] = set()
+        for pair in pairs:
+            for business_id, row_ids in self._edges.get(pair, {}).items():
+                if origin and not any(self._supplier_rows[row_id]["origin"] == origin for row_id in row_ids):
+                    continue
+                affected.setdefault(business_id, []).append(pair)
+                matched_pairs.add(pair)
+
+        if now is None:
+            now = datetime.now(timezone.utc).timestamp()
+        after = -math.inf if include_expired else now
+        business_ids = sorted(affected)
+        page = business_ids[offset:] if limit is None else business_ids[offset:offset + limit]
+        items = []
+        for business_id in page:
+            row_ids = {
+                row_id
+                for pair in affected[business_id]
+                for row_id in self._edges[pair][business_id]
+                if not origin or self._supplier_rows[row_id]["origin"] == origin
+            }
+            items.append({
+                "business_id": business_id,
+                "materials": sorted({material for _, material in affected[business_id]}),
+                "suppliers": [
+                    {key: self._supplier_rows[row_id][key] for key in SUPPLIER_RESULT_KEYS} for row_id in sorted(row_ids)
+                ],
+                "batches": [
+                    {key: batch[key] for key in BATCH_RESULT_KEYS}
+                    for batch in self._batches_for(business_id, after, since)
+                ],
+            })
+        return {
+            # Normalized names; items carry the names as each business entered them
+            "suppliers": sorted({supplier_name for supplier_name, _ in matched_pairs}),
+            "materials": sorted({material for _, material in matched_pairs}),
+            "total": len(business_ids),
+            "batch_count": sum(self._count_batches(business_id, after, since) for business_id in business_ids),
+            "items": items,
+        }
+
+    def __len__(self) -> int:
+        return len(self._supplier_rows)
+
+
+graph = TraceabilityGraph()
+loaded = False
+
+# While load_all runs, writes also go to the graph being built. Supplier and
+# batch rows are insert-only, so re-adding a row the scan also reads is harmless.
+_building: Optional[TraceabilityGraph] = None
+
+
+def _graphs() -> List[TraceabilityGraph]:
+    return [graph] if _building is None else [graph, _building]
+
+
+def record_supplier(row: Dict[str, Any]) -> None:
+    """Adds a newly written raw material supplier row."""
+    for target in _graphs():
+        target.add_supplier(row)
+
+
+def record_batch(row: Dict[str, Any]) -> None:
+    """Adds a newly written batch row."""
+    for target in _graphs():
+        target.add_batch(row)
+
+
+async def load_all(chunk_size: int = 5000) -> None:
+    """Builds the graph from the supplier and batch tables, swapping it in when complete."""
+    global graph, loaded, _building
+    _building = TraceabilityGraph()
+    try:
+        async for rows in db.iter_rows("raw_material_suppliers", SUPPLIER_COLUMNS, chunk_size=chunk_size):
+            for row in rows:
+                _building.add_supplier(row)
+        async for rows in db.iter_rows("batch_production", BATCH_COLUMNS, chunk_size=chunk_size):
+            for row in rows:
+                _building.add_batch(row)
+        graph, loaded = _building, True
+    finally:
+        _building = None
+    logger.info(f"Traceability graph loaded with {len(graph)} supplier links")